@@ -0,0 +1,201 @@
+"""
+Talkgroup Activity Analytics for DMR Libertas
+
+This module keeps sliding-window activity statistics over the radio event
+stream: calls and airtime per talkgroup and per caller over the last 1 min,
+15 min and 1 h.
+
+Each window is split into a fixed ring of sub-buckets, and each sub-bucket
+tracks its busiest talkgroups and callers with a Space-Saving summary of
+bounded size. Memory is therefore fixed regardless of how many IDs appear,
+and recording a call touches a constant number of summaries.
+"""
+import heapq
+import itertools
+import logging
+import math
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Windows reported by /api/stats, in seconds
+WINDOWS = {"1m": 60, "15m": 900, "1h": 3600}
+BUCKETS_PER_WINDOW = 12   # sub-buckets per window; expiry granularity is window / 12
+TOP_K_CAPACITY = 128      # IDs tracked per sub-bucket and dimension
+DEFAULT_TOP_K = 10
+
+# Metrics
+CALLS_RECORDED = registry.counter("dmr_analytics_calls_total", "Calls recorded by the activity analytics")
+
+
+class SpaceSaving:
+    """Weighted Space-Saving heavy-hitter summary with fixed capacity.
+
+    Counts are overestimates by at most the tracked error of each entry;
+    any ID whose true weight exceeds total / capacity is guaranteed to be present.
+    The smallest entry is found through a lazily pruned min-heap, so an update
+    costs O(log capacity) amortized even when every ID is new.
+    """
+
+    __slots__ = ("capacity", "counts", "errors", "_heap", "_seq")
+
+    def __init__(self, capacity: int = TOP_K_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, float] = {}
+        self.errors: Dict[Hashable, float] = {}
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+
+    def add(self, key: Hashable, weight: float = 1.0) -> None:
+        counts = self.counts
+        if key in counts:
+            count = counts[key] + weight
+        elif len(counts) < self.capacity:
+            count = weight
+            self.errors[key] = 0.0
+        else:
+            # Replace the smallest entry; the newcomer inherits its count as error
+            floor, victim = self._pop_min()
+            del counts[victim]
+            del self.errors[victim]
+            count = floor + weight
+            self.errors[key] = floor
+        counts[key] = count
+        # The sequence number keeps mixed-type keys from ever being compared
+        heapq.heappush(self._heap, (count, next(self._seq), key))
+        if len(self._heap) > 4 * self.capacity:
+            self._compact()
+
+    def _pop_min(self):
+        """Pop the smallest live entry, skipping stale heap records."""
+        heap, counts = self._heap, self.counts
+        while True:
+            count, _, key = heapq.heappop(heap)
+            if counts.get(key) == count:
+                return count, key
+
+    def _compact(self) -> None:
+        """Rebuild the heap from the live counts."""
+        self._heap = [(count, next(self._seq), key) for key, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def clear(self) -> None:
+        self.counts.clear()
+        self.errors.clear()
+        self._heap.clear()
+
+
+class _Bucket:
+    """Activity for one sub-bucket of a window."""
+
+    __slots__ = ("epoch", "calls", "airtime", "tg_calls", "tg_airtime", "caller_calls", "caller_airtime")
+
+    def __init__(self, capacity: int):
+        self.epoch = -1
+        self.calls = 0
+        self.airtime = 0.0
+        self.tg_calls = SpaceSaving(capacity)
+        self.tg_airtime = SpaceSaving(capacity)
+        self.caller_calls = SpaceSaving(capacity)
+        self.caller_airtime = SpaceSaving(capacity)
+
+    def reset(self, epoch: int) -> None:
+        self.epoch = epoch
+        self.calls = 0
+        self.airtime = 0.0
+        self.tg_calls.clear()
+        self.tg_airtime.clear()
+        self.caller_calls.clear()
+        self.caller_airtime.clear()
+
+
+class SlidingWindow:
+    """Call and airtime statistics over a sliding time window."""
+
+    def __init__(self, seconds: float, buckets: int = BUCKETS_PER_WINDOW, capacity: int = TOP_K_CAPACITY):
+        self.seconds = seconds
+        self.bucket_seconds = seconds / buckets
+        self._buckets = [_Bucket(capacity) for _ in range(buckets)]
+
+    def record(self, timestamp: float, talkgroup: Hashable, caller: Hashable, airtime: float) -> None:
+        epoch = int(timestamp // self.bucket_seconds)
+        bucket = self._buckets[epoch % len(self._buckets)]
+        if bucket.epoch != epoch:
+            if epoch < bucket.epoch:
+                return  # Older than the window
+            bucket.reset(epoch)
+        bucket.calls += 1
+        bucket.airtime += airtime
+        if talkgroup is not None:
+            bucket.tg_calls.add(talkgroup)
+            if airtime:
+                bucket.tg_airtime.add(talkgroup, airtime)
+        if caller is not None:
+            bucket.caller_calls.add(caller)
+            if airtime:
+                bucket.caller_airtime.add(caller, airtime)
+
+    def _live_buckets(self, now: float) -> List[_Bucket]:
+        current = int(now // self.bucket_seconds)
+        oldest = current - len(self._buckets) + 1
+        return [b for b in self._buckets if oldest <= b.epoch <= current]
+
+    def snapshot(self, now: float, limit: int = DEFAULT_TOP_K) -> Dict[str, Any]:
+        """Totals and top talkgroups/callers for the window ending at now."""
+        buckets = self._live_buckets(now)
+
+        def top(attribute: str) -> List[Dict[str, Any]]:
+            merged: Dict[Hashable, float] = {}
+            for bucket in buckets:
+                for key, count in getattr(bucket, attribute).counts.items():
+                    merged[key] = merged.get(key, 0) + count
+            ranked = sorted(merged.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [{"id": key, "value": round(value, 3)} for key, value in ranked]
+
+        return {
+            "calls": sum(b.calls for b in buckets),
+            "airtime": round(sum(b.airtime for b in buckets), 3),
+            "top_talkgroups_by_calls": top("tg_calls"),
+            "top_talkgroups_by_airtime": top("tg_airtime"),
+            "top_callers_by_calls": top("caller_calls"),
+            "top_callers_by_airtime": top("caller_airtime"),
+        }
+
+
+class ActivityAnalytics:
+    """Sliding-window talkgroup and caller activity over all configured windows."""
+
+    def __init__(self, windows: Optional[Dict[str, float]] = None, capacity: int = TOP_K_CAPACITY):
+        self.windows = {name: SlidingWindow(seconds, capacity=capacity)
+                        for name, seconds in (windows or WINDOWS).items()}
+
+    def record_call(self, talkgroup: Hashable, caller: Hashable, airtime: float = 0.0,
+                    timestamp: Optional[float] = None) -> None:
+        """Record one call (or one completed call with its airtime in seconds).
+
+        Timestamps come from the radio's clock, so ones in the future are
+        clamped to now rather than allowed to reset live sub-buckets. Calls
+        with a non-numeric time or airtime are ignored.
+        """
+        now = time.time()
+        try:
+            timestamp = float(timestamp) if timestamp else now
+            airtime = float(airtime or 0.0)
+        except (TypeError, ValueError):
+            logger.debug(f"Ignoring call with invalid time {timestamp!r} or airtime {airtime!r}")
+            return
+        if not (math.isfinite(timestamp) and math.isfinite(airtime)) or airtime < 0:
+            return
+        timestamp = min(timestamp, now)
+        for window in self.windows.values():
+            window.record(timestamp, talkgroup, caller, airtime)
+        CALLS_RECORDED.inc()
+
+    def get_stats(self, window: Optional[str] = None, limit: int = DEFAULT_TOP_K) -> Dict[str, Any]:
+        """Get statistics for one window, or all of them."""
+        now = time.time()
+        names = [window] if window else list(self.windows)
+        return {name: self.windows[name].snapshot(now, limit) for name in names}
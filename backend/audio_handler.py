@@ -3,14 +3,20 @@ Audio Handler for DMR Libertas
 
 This module handles audio capture, processing, and AI integration for DMR radio audio.
 Supports both real audio devices and mock mode for development.
+
+Several radios can share one process: AUDIO_CHANNEL_MAP maps input channels
+on one or more devices to radio IDs, each device is captured by a single
+stream, and resampling, metering and VAD gating run on all of its channels
+in one numpy pass.
 """
 import asyncio
 import logging
 import os
+import time
 import wave
 import numpy as np
 from dataclasses import dataclass
-from typing import Optional, Callable, Any, Dict
+from typing import Any, Callable, Dict, List, Optional, Union
 
 # Optional imports for audio processing
 try:
@@ -21,105 +27,186 @@ try:
 except ImportError:
     AUDIO_DEPS_AVAILABLE = False
 
+from metrics import registry
+from plugins import Plugin, PluginContext
+
 logger = logging.getLogger(__name__)
 
 # Audio configuration
-SAMPLE_RATE = 16000  # Hz
-CHANNELS = 1         # Mono audio
+SAMPLE_RATE = 16000  # Hz; processing rate for VAD and ASR
 CHUNK_SIZE = 480     # 30ms at 16kHz
 SAMPLE_WIDTH = 2     # 16-bit audio
 VAD_MODE = 3         # Aggressiveness of voice activity detection (0-3)
+BUFFER_SECONDS = 30  # Audio history kept per channel
+MAX_PENDING_BLOCKS = 64  # Captured blocks queued for processing before new ones are dropped
 
 # Audio processing parameters
 SILENCE_THRESHOLD = 0.01  # RMS threshold for silence detection
 MIN_VOICE_ACTIVITY = 0.5  # Minimum voice activity ratio to consider as speech
 
+# Metrics
+AUDIO_OVERRUNS = registry.counter("dmr_audio_overruns_total", "Audio input overflows reported by the device")
+VAD_FRAMES = registry.counter("dmr_audio_vad_frames_total", "Audio chunks run through voice activity detection")
+VAD_SPEECH_FRAMES = registry.counter("dmr_audio_vad_speech_frames_total", "Audio chunks classified as speech")
+VAD_RATIO = registry.gauge(
+    "dmr_audio_vad_ratio", "Fraction of audio chunks classified as speech",
+    func=lambda: VAD_SPEECH_FRAMES.value / VAD_FRAMES.value if VAD_FRAMES.value else 0.0
+)
+ASR_LATENCY = registry.histogram("dmr_audio_asr_latency_seconds", "Time spent processing detected speech")
+AUDIO_CHANNELS = registry.gauge("dmr_audio_channels", "Audio input channels being captured")
+
+
 @dataclass
-class AudioBuffer:
-    """Circular buffer for audio data."""
-    data: bytearray
-    size: int
-    write_pos: int = 0
-    read_pos: int = 0
+class ChannelMapping:
+    """One input channel wired to one radio."""
+    radio_id: str
+    device: Optional[Union[int, str]]  # sounddevice index or name; None for the default input
+    channel: int
+
+
+def parse_channel_map(value: str, default_radio_id: str = "local") -> List[ChannelMapping]:
+    """Parse AUDIO_CHANNEL_MAP entries of the form radio_id=device:channel.
+
+    The device may be an index, a name, or empty for the default input, e.g.
+    "3100001=USB Audio:0,3100002=USB Audio:1". An empty map captures channel 0
+    of the default input as default_radio_id.
+    """
+    mappings = []
+    for entry in (e.strip() for e in value.split(",")):
+        if not entry:
+            continue
+        radio_id, sep, source = entry.partition("=")
+        device, _, channel = source.rpartition(":")
+        if not sep or not radio_id.strip() or not channel.strip().isdigit():
+            raise ValueError(f"Invalid AUDIO_CHANNEL_MAP entry: {entry!r}")
+        device = device.strip()
+        mappings.append(ChannelMapping(
+            radio_id=radio_id.strip(),
+            device=int(device) if device.isdigit() else (device or None),
+            channel=int(channel),
+        ))
+    return mappings or [ChannelMapping(default_radio_id, None, 0)]
+
+
+def resample(block: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Resample a (frames, channels) int16 block, all channels at once."""
+    if src_rate == dst_rate:
+        return block
+    if src_rate % dst_rate == 0:
+        # Integer decimation; averaging each group doubles as a crude anti-alias filter
+        factor = src_rate // dst_rate
+        frames = block.shape[0] // factor * factor
+        averaged = block[:frames].reshape(-1, factor, block.shape[1]).mean(axis=1)
+        return averaged.astype(np.int16)
+    # Linear interpolation, with the same sample positions for every channel
+    count = block.shape[0] * dst_rate // src_rate
+    positions = np.arange(count) * (src_rate / dst_rate)
+    left = positions.astype(np.intp)
+    right = np.minimum(left + 1, block.shape[0] - 1)
+    weight = (positions - left)[:, None]
+    return (block[left] * (1 - weight) + block[right] * weight).astype(np.int16)
+
+
+def rms_dbfs(block: np.ndarray) -> np.ndarray:
+    """Per-channel level of a (frames, channels) int16 block in dBFS."""
+    if not len(block):
+        return np.full(block.shape[1], -100.0)
+    rms = np.sqrt(np.mean(np.square(block, dtype=np.float32), axis=0))
+    with np.errstate(divide="ignore"):
+        dbfs = 20 * np.log10(rms / 32768.0)  # 16-bit full scale
+    return np.clip(dbfs, -100.0, 0.0)
+
+
+class MultiChannelBuffer:
+    """Circular buffer of (frames, channels) int16 audio."""
     
-    @classmethod
-    def from_seconds(cls, seconds: int, sample_rate: int = SAMPLE_RATE, 
-                    channels: int = CHANNELS, sample_width: int = SAMPLE_WIDTH):
-        """Create a buffer that can hold the specified number of seconds of audio."""
-        size = seconds * sample_rate * channels * sample_width
-        return cls(bytearray(size), size)
+    def __init__(self, seconds: int, channels: int, sample_rate: int = SAMPLE_RATE):
+        self.data = np.zeros((seconds * sample_rate, channels), dtype=np.int16)
+        self.size = len(self.data)
+        self.write_pos = 0
+        self.filled = 0
     
-    def write(self, data: bytes) -> int:
-        """Write data to the buffer, overwriting old data if necessary."""
-        data_len = len(data)
-        if data_len >= self.size:
-            # If data is larger than buffer, only keep the end
-            data = data[-self.size:]
+    def write(self, block: np.ndarray) -> None:
+        """Append frames, overwriting the oldest when full."""
+        count = len(block)
+        if count >= self.size:
+            self.data[:] = block[-self.size:]
             self.write_pos = 0
-            self.data[:] = data
-            return data_len
-            
-        remaining = self.size - self.write_pos
-        if data_len <= remaining:
-            # Data fits in remaining space
-            self.data[self.write_pos:self.write_pos + data_len] = data
+            self.filled = self.size
+            return
+        end = self.write_pos + count
+        if end <= self.size:
+            self.data[self.write_pos:end] = block
         else:
-            # Wrap around to beginning of buffer
-            self.data[self.write_pos:] = data[:remaining]
-            self.data[:data_len - remaining] = data[remaining:]
-            
-        self.write_pos = (self.write_pos + data_len) % self.size
-        self.read_pos = max(0, self.write_pos - self.size // 2)  # Keep some history
-        return data_len
+            first = self.size - self.write_pos
+            self.data[self.write_pos:] = block[:first]
+            self.data[:count - first] = block[first:]
+        self.write_pos = end % self.size
+        self.filled = min(self.size, self.filled + count)
     
-    def read(self, size: int) -> bytes:
-        """Read up to size bytes from the buffer."""
-        available = (self.write_pos - self.read_pos) % self.size
-        if available == 0:
-            return b''
-            
-        read_size = min(size, available)
-        if self.read_pos + read_size <= self.size:
-            # Read doesn't wrap around
-            result = bytes(self.data[self.read_pos:self.read_pos + read_size])
-        else:
-            # Read wraps around to beginning of buffer
-            first_part = self.data[self.read_pos:]
-            second_part = self.data[:read_size - len(first_part)]
-            result = bytes(first_part + second_part)
-            
-        self.read_pos = (self.read_pos + read_size) % self.size
-        return result
+    def latest(self, frames: Optional[int] = None) -> np.ndarray:
+        """Get the most recent frames (all buffered audio by default), oldest first."""
+        frames = self.filled if frames is None else min(frames, self.filled)
+        start = (self.write_pos - frames) % self.size
+        if start + frames <= self.size:
+            return self.data[start:start + frames].copy()
+        return np.concatenate((self.data[start:], self.data[:frames - (self.size - start)]))
+
+
+class CaptureGroup:
+    """The mapped channels of one input device, captured by a single stream."""
+    
+    def __init__(self, device: Optional[Union[int, str]], mappings: List[ChannelMapping]):
+        self.device = device
+        self.mappings = mappings
+        self.radio_ids = [m.radio_id for m in mappings]
+        self.columns = [m.channel for m in mappings]
+        self.rate = SAMPLE_RATE
+        self.stream = None
+        self.buffer = MultiChannelBuffer(BUFFER_SECONDS, len(mappings))
+        self.levels = np.full(len(mappings), -100.0)
+        self.speech = np.zeros(len(mappings), dtype=bool)
+        self.vads = None
 
 
 class AudioHandler:
     """Handles audio capture, processing, and AI integration."""
     
-    def __init__(self):
+    def __init__(self, channel_map: Optional[str] = None):
         self.sample_rate = SAMPLE_RATE
-        self.channels = CHANNELS
         self.chunk_size = CHUNK_SIZE
         self.sample_width = SAMPLE_WIDTH
         self.mock_mode = os.getenv("MOCK_MODE", "false").lower() == "true"
         
+        # One capture group (and stream) per input device
+        mappings = parse_channel_map(
+            channel_map if channel_map is not None else os.getenv("AUDIO_CHANNEL_MAP", ""),
+            default_radio_id=os.getenv("RADIO_ID", "local"),
+        )
+        by_device: Dict[Any, List[ChannelMapping]] = {}
+        for mapping in mappings:
+            by_device.setdefault(mapping.device, []).append(mapping)
+        self.groups = [CaptureGroup(device, group) for device, group in by_device.items()]
+        self.channels = len(mappings)
+        
         # Audio state
         self.is_recording = False
-        self.stream = None
-        self.audio_buffer = AudioBuffer.from_seconds(30)  # 30-second buffer
-        self.vad = None
         self.current_transcription = ""
         self.audio_processor = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._process_task: Optional[asyncio.Task] = None
         
-        # Initialize VAD if available
+        # Initialize VAD if available; webrtcvad keeps state, so one per channel
         if AUDIO_DEPS_AVAILABLE and not self.mock_mode:
             try:
-                self.vad = webrtcvad.Vad()
-                self.vad.set_mode(VAD_MODE)
+                for group in self.groups:
+                    group.vads = [webrtcvad.Vad(VAD_MODE) for _ in group.mappings]
             except Exception as e:
                 logger.warning(f"Failed to initialize VAD: {e}")
     
     async def start(self) -> bool:
-        """Start audio capture and processing."""
+        """Start audio capture and processing on every mapped device."""
         if self.is_recording:
             return True
             
@@ -131,105 +218,128 @@ class AudioHandler:
         if not AUDIO_DEPS_AVAILABLE:
             logger.error("Audio dependencies not available. Install with: pip install sounddevice soundfile webrtcvad")
             return False
-            
-        try:
-            # Initialize audio stream
-            self.stream = sd.InputStream(
-                samplerate=self.sample_rate,
-                channels=self.channels,
-                dtype='int16',
-                blocksize=self.chunk_size,
-                callback=self._audio_callback
-            )
-            
-            self.stream.start()
-            self.is_recording = True
-            logger.info("Audio capture started")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to start audio capture: {e}")
-            self.is_recording = False
+        
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(MAX_PENDING_BLOCKS)
+        for group in self.groups:
+            try:
+                # Capture at the device's native rate; blocks are resampled for processing
+                info = sd.query_devices(group.device, "input")
+                group.rate = int(info["default_samplerate"])
+                group.stream = sd.InputStream(
+                    device=group.device,
+                    samplerate=group.rate,
+                    channels=max(group.columns) + 1,
+                    dtype='int16',
+                    blocksize=self.chunk_size * group.rate // self.sample_rate,
+                    callback=self._make_callback(group)
+                )
+                group.stream.start()
+                logger.info(f"Audio capture started on {info['name']} for radios {', '.join(group.radio_ids)}")
+            except Exception as e:
+                logger.error(f"Failed to start audio capture on device {group.device}: {e}")
+                group.stream = None
+        
+        if not any(group.stream for group in self.groups):
             return False
+        self._process_task = asyncio.create_task(self._process_loop())
+        self.is_recording = True
+        AUDIO_CHANNELS.set(sum(len(g.mappings) for g in self.groups if g.stream))
+        return True
     
     async def stop(self) -> None:
         """Stop audio capture and processing."""
         if not self.is_recording:
             return
             
-        if self.stream is not None:
+        for group in self.groups:
+            if group.stream is None:
+                continue
             try:
-                self.stream.stop()
-                self.stream.close()
+                group.stream.stop()
+                group.stream.close()
             except Exception as e:
                 logger.error(f"Error stopping audio stream: {e}")
             finally:
-                self.stream = None
+                group.stream = None
+        
+        if self._process_task:
+            self._process_task.cancel()
+            try:
+                await self._process_task
+            except asyncio.CancelledError:
+                pass
+            self._process_task = None
                 
         self.is_recording = False
+        AUDIO_CHANNELS.set(0)
         logger.info("Audio capture stopped")
     
-    def _audio_callback(self, indata: np.ndarray, frames: int, time_info: dict, status: int) -> None:
-        """Callback for audio stream data."""
-        if status:
-            logger.warning(f"Audio stream status: {status}")
-            
-        # Convert to bytes and add to buffer
-        audio_data = indata.tobytes()
-        self.audio_buffer.write(audio_data)
-        
-        # Process audio in background
-        asyncio.create_task(self._process_audio(audio_data))
+    def _make_callback(self, group: CaptureGroup) -> Callable:
+        def callback(indata: np.ndarray, frames: int, time_info: dict, status: int) -> None:
+            """Callback for audio stream data; runs on the audio thread."""
+            if status:
+                if getattr(status, "input_overflow", False):
+                    AUDIO_OVERRUNS.inc()
+                logger.warning(f"Audio stream status: {status}")
+            # Keep only the mapped channels and hand the block to the event loop
+            block = indata[:, group.columns]
+            self._loop.call_soon_threadsafe(self._enqueue, group, block)
+        return callback
     
-    async def _process_audio(self, audio_data: bytes) -> None:
-        """Process audio data for voice activity and transcription."""
+    def _enqueue(self, group: CaptureGroup, block: np.ndarray) -> None:
         try:
-            # Convert to numpy array for processing
-            audio_array = np.frombuffer(audio_data, dtype=np.int16)
+            self._queue.put_nowait((group, block))
+        except asyncio.QueueFull:
+            AUDIO_OVERRUNS.inc()
+    
+    async def _process_loop(self) -> None:
+        while True:
+            group, block = await self._queue.get()
+            await self._process_audio(group, block)
+    
+    async def _process_audio(self, group: CaptureGroup, block: np.ndarray) -> None:
+        """Process one captured block for every channel of a device at once."""
+        try:
+            audio = resample(block, group.rate, self.sample_rate)
+            group.buffer.write(audio)
+            group.levels = rms_dbfs(audio)
             
             # Check for voice activity
-            is_speech = self._detect_voice_activity(audio_array)
+            speech = self._detect_voice_activity(group, audio)
+            group.speech = speech
+            VAD_FRAMES.inc(len(speech))
             
-            if is_speech:
+            for index in np.flatnonzero(speech):
+                VAD_SPEECH_FRAMES.inc()
                 # Process speech
-                await self._process_speech(audio_array)
+                started = time.perf_counter()
+                await self._process_speech(group.radio_ids[index], audio[:, index])
+                ASR_LATENCY.observe(time.perf_counter() - started)
                 
         except Exception as e:
             logger.error(f"Error processing audio: {e}")
     
-    def _detect_voice_activity(self, audio_data: np.ndarray) -> bool:
-        """Detect if audio contains voice activity."""
-        if self.vad is None:
-            # Fallback to simple RMS-based detection
-            rms = np.sqrt(np.mean(np.square(audio_data.astype(np.float32))))
-            return rms > SILENCE_THRESHOLD * 32768  # Scale to 16-bit range
+    def _detect_voice_activity(self, group: CaptureGroup, audio: np.ndarray) -> np.ndarray:
+        """Detect voice activity on each channel of a (frames, channels) block."""
+        # The RMS gate runs on all channels in one pass; only loud channels reach WebRTC VAD
+        active = group.levels > 20 * np.log10(SILENCE_THRESHOLD)
+        if group.vads is None or len(audio) not in (160, 320, 480):
+            return active
             
-        # Use WebRTC VAD if available
-        try:
-            # Convert to 16kHz, 1 channel if needed
-            if len(audio_data.shape) > 1:
-                audio_data = audio_data[:, 0]  # Take first channel if stereo
-                
-            # Resample to 16kHz if needed
-            if len(audio_data) != 160:  # 10ms at 16kHz
-                # Simple decimation for demo - use proper resampling in production
-                audio_data = audio_data[::2] if len(audio_data) > 160 else audio_data
-                
-            # Convert to bytes for VAD
-            audio_bytes = audio_data.astype(np.int16).tobytes()
-            
-            # Check for voice activity
-            return self.vad.is_speech(audio_bytes, 16000)  # 16kHz sample rate
-            
-        except Exception as e:
-            logger.warning(f"VAD error: {e}")
-            return True  # Default to processing if VAD fails
+        channels = np.ascontiguousarray(audio.T)
+        for index in np.flatnonzero(active):
+            try:
+                active[index] = group.vads[index].is_speech(channels[index].tobytes(), self.sample_rate)
+            except Exception as e:
+                logger.warning(f"VAD error: {e}")  # Default to processing if VAD fails
+        return active
     
-    async def _process_speech(self, audio_data: np.ndarray) -> None:
+    async def _process_speech(self, radio_id: str, audio_data: np.ndarray) -> None:
         """Process speech audio (transcription, etc.)."""
         # This is where you would integrate with Whisper or other ASR
         # For now, just log that we detected speech
-        logger.debug("Speech detected in audio")
+        logger.debug(f"Speech detected in audio from radio {radio_id}")
         
         # In a real implementation, you would:
         # 1. Buffer audio until end of speech is detected
@@ -237,6 +347,15 @@ class AudioHandler:
         # 3. Process the transcription (translate, extract keywords, etc.)
         # 4. Send results via WebSocket to the frontend
     
+    def _find_channel(self, radio_id: Optional[str]):
+        """Find the capture group and column for a radio (the first channel if None)."""
+        for group in self.groups:
+            if radio_id is None:
+                return group, 0
+            if radio_id in group.radio_ids:
+                return group, group.radio_ids.index(radio_id)
+        return None, None
+    
     async def play_audio(self, audio_data: bytes, sample_rate: int = None) -> bool:
         """Play audio data through the default output device."""
         if not AUDIO_DEPS_AVAILABLE or self.mock_mode:
@@ -251,7 +370,8 @@ class AudioHandler:
             
             # Play asynchronously
             sd.play(audio_array, samplerate=sample_rate)
-            sd.wait()  # Wait for playback to finish
+            # Wait for playback to finish without blocking the event loop
+            await asyncio.get_running_loop().run_in_executor(None, sd.wait)
             return True
             
         except Exception as e:
@@ -259,18 +379,21 @@ class AudioHandler:
             return False
     
     async def save_audio(self, file_path: str, audio_data: bytes = None, 
-                        sample_rate: int = None, format: str = 'wav') -> bool:
-        """Save audio data to a file."""
+                        sample_rate: int = None, format: str = 'wav',
+                        radio_id: Optional[str] = None) -> bool:
+        """Save audio data, or a radio's buffered audio, to a file."""
         if not AUDIO_DEPS_AVAILABLE:
             return False
             
         try:
             sample_rate = sample_rate or self.sample_rate
-            audio_array = np.frombuffer(audio_data or self.audio_buffer.read(-1), dtype=np.int16)
-            
-            # Reshape if stereo
-            if len(audio_array.shape) == 1 and self.channels > 1:
-                audio_array = audio_array.reshape(-1, self.channels)
+            if audio_data is not None:
+                audio_array = np.frombuffer(audio_data, dtype=np.int16)
+            else:
+                group, column = self._find_channel(radio_id)
+                if group is None:
+                    return False
+                audio_array = group.buffer.latest()[:, column]
                 
             sf.write(file_path, audio_array, sample_rate, format=format)
             return True
@@ -279,29 +402,46 @@ class AudioHandler:
             logger.error(f"Error saving audio: {e}")
             return False
     
-    def get_audio_level(self, window_ms: int = 100) -> float:
-        """Get the current audio level in dBFS."""
+    def get_audio_level(self, window_ms: int = 100, radio_id: Optional[str] = None) -> float:
+        """Get the current audio level of a radio's channel in dBFS."""
         if not self.is_recording or self.mock_mode:
             return -100.0  # Silence in dBFS
             
         try:
-            # Calculate RMS of the last window_ms of audio
-            window_samples = (window_ms * self.sample_rate) // 1000
-            audio_data = self.audio_buffer.read(window_samples * self.sample_width * self.channels)
-            
-            if not audio_data:
+            group, column = self._find_channel(radio_id)
+            if group is None:
                 return -100.0
-                
-            audio_array = np.frombuffer(audio_data, dtype=np.int16)
-            rms = np.sqrt(np.mean(np.square(audio_array.astype(np.float32))))
-            
-            # Convert to dBFS
-            if rms < 1e-6:  # Avoid log(0)
-                return -100.0
-                
-            dbfs = 20 * np.log10(rms / 32768.0)  # 16-bit full scale
-            return max(-100.0, min(0.0, dbfs))  # Clamp to -100..0 dBFS
+            window_samples = (window_ms * self.sample_rate) // 1000
+            return float(rms_dbfs(group.buffer.latest(window_samples))[column])
             
         except Exception as e:
             logger.error(f"Error getting audio level: {e}")
-            return -100.0
\ No newline at end of file
+            return -100.0
+    
+    def get_channels(self) -> List[Dict[str, Any]]:
+        """Get the channel map with the latest level and speech state per radio."""
+        channels = []
+        for group in self.groups:
+            for index, mapping in enumerate(group.mappings):
+                channels.append({
+                    "radio_id": mapping.radio_id,
+                    "device": mapping.device,
+                    "channel": mapping.channel,
+                    "capturing": group.stream is not None,
+                    "level_dbfs": round(float(group.levels[index]), 1),
+                    "speech": bool(group.speech[index]),
+                })
+        return channels
+
+class AudioPlugin(Plugin):
+    """Plugin exposing the audio pipeline; capture starts on request."""
+    name = "audio"
+    
+    def __init__(self):
+        self.handler = AudioHandler()
+    
+    async def start(self, context: PluginContext) -> None:
+        self.context = context
+    
+    async def stop(self) -> None:
+        await self.handler.stop()
@@ -0,0 +1,192 @@
+"""
+Runtime Diagnostics for DMR Libertas
+
+This module watches the asyncio event loop for stalls and provides an
+on-demand sampling profiler for the running server.
+Both run in helper threads so they keep working while the loop is blocked.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as StackCounter
+from typing import Any, Dict, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Watchdog configuration
+LAG_CHECK_INTERVAL = 0.1   # seconds between loop heartbeats
+LAG_THRESHOLD = 0.25       # seconds of lag before the loop is considered stalled
+
+# Profiler limits
+MAX_PROFILE_SECONDS = 60.0
+MIN_SAMPLE_INTERVAL = 0.001
+
+# Metrics
+LOOP_LAG = registry.histogram("dmr_event_loop_lag_seconds", "Delay between scheduled and actual loop wakeups")
+LOOP_STALLS = registry.counter("dmr_event_loop_stalls_total", "Times the event loop lag crossed the stall threshold")
+
+
+def _format_frame(frame) -> str:
+    """Format a frame as module:function:line for collapsed stacks."""
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+
+class LoopWatchdog:
+    """Measures event loop lag and logs the stack of whatever blocks the loop."""
+
+    def __init__(self, interval: float = LAG_CHECK_INTERVAL, threshold: float = LAG_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def loop_thread_id(self) -> Optional[int]:
+        return self._loop_thread_id
+
+    def start(self) -> None:
+        """Start watching the running event loop."""
+        if self.running:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Loop watchdog started (threshold: {self.threshold * 1000:.0f} ms)")
+
+    async def stop(self) -> None:
+        """Stop the watchdog."""
+        self._stop_event.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        if self._thread:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    async def _heartbeat(self):
+        """Record a beat every interval and measure how late each wakeup was."""
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self._last_beat = time.monotonic()
+            LOOP_LAG.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+    def _watch(self):
+        """Watchdog thread: dump the loop thread's stack when heartbeats stop."""
+        reported = False
+        while not self._stop_event.wait(self.interval):
+            stalled_for = time.monotonic() - self._last_beat - self.interval
+            if stalled_for < self.threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+
+            # Report each stall once, with the stack that is holding the loop
+            reported = True
+            self.stalls += 1
+            LOOP_STALLS.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<unavailable>\n"
+            logger.warning(
+                f"Event loop blocked for {stalled_for * 1000:.0f} ms; "
+                f"loop thread stack:\n{stack}"
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get watchdog statistics."""
+        return {
+            "running": self.running,
+            "threshold": self.threshold,
+            "stalls": self.stalls,
+            "max_lag": self.max_lag,
+            "lag_count": LOOP_LAG.count,
+            "lag_sum": LOOP_LAG.sum,
+        }
+
+
+class SamplingProfiler:
+    """Time-bounded sampling profiler producing collapsed stacks.
+
+    The output is one line per unique stack (root first, frames separated
+    by semicolons, followed by the sample count), which flamegraph.pl and
+    speedscope read directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, duration: float, interval: float = 0.005,
+               thread_id: Optional[int] = None) -> str:
+        """Sample stacks for duration seconds and return them collapsed.
+
+        Blocks the calling thread; run it in an executor from async code.
+        Samples every thread except the profiler's own unless thread_id is given.
+        """
+        duration = min(max(duration, 0.0), MAX_PROFILE_SECONDS)
+        interval = max(interval, MIN_SAMPLE_INTERVAL)
+
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+
+        try:
+            own_id = threading.get_ident()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks: StackCounter = StackCounter()
+            deadline = time.monotonic() + duration
+
+            while time.monotonic() < deadline:
+                for tid, frame in sys._current_frames().items():
+                    if tid == own_id or (thread_id is not None and tid != thread_id):
+                        continue
+                    frames = []
+                    while frame is not None:
+                        frames.append(_format_frame(frame))
+                        frame = frame.f_back
+                    frames.append(names.get(tid, str(tid)))
+                    stacks[";".join(reversed(frames))] += 1
+                time.sleep(interval)
+
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+    async def profile(self, duration: float, interval: float = 0.005,
+                      thread_id: Optional[int] = None) -> str:
+        """Sample stacks from a worker thread without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.sample, duration, interval, thread_id)
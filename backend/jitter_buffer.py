@@ -0,0 +1,338 @@
+"""
+Jitter Buffer for DMR Libertas
+
+This module reassembles network-sourced voice frames into a steady frame
+clock. Each stream gets an adaptive jitter buffer that reorders frames by
+sequence number, drops frames that arrive too late to play, and emits loss
+markers (payload None) so consumers can conceal gaps.
+
+One clock task drives every active stream, so dozens of simultaneous calls
+cost one timer and a few preallocated slots each.
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Frame timing from docs/PROTOCOL_NOTES.md: one AMBE+2 frame per 20 ms,
+# three per 60 ms superframe
+FRAME_DURATION = 0.020     # seconds
+SEQ_MODULUS = 65536        # sequence numbers wrap at 16 bits
+
+# Buffer configuration
+BUFFER_SLOTS = 64          # frames held per stream (1.28 s at 20 ms)
+TARGET_DELAY = 0.060       # seconds buffered before playout starts
+MIN_DELAY = 0.040          # adaptive delay bounds
+MAX_DELAY = 0.400
+STREAM_TIMEOUT = 1.0       # seconds without frames before a stream is closed
+MAX_CONCEALMENT = 0.100    # seconds of underrun concealed before playout stops and rebuffers
+SETTLE_TIME = 0.500        # seconds of playout before the delay may be trimmed
+MAX_CATCHUP_TICKS = 5      # ticks replayed at once after the clock falls behind
+
+# Metrics
+FRAMES_PLAYED = registry.counter("dmr_jitter_frames_played_total", "Voice frames played out by jitter buffers")
+FRAMES_LOST = registry.counter("dmr_jitter_frames_lost_total", "Loss markers emitted for missing voice frames")
+FRAMES_TRIMMED = registry.counter(
+    "dmr_jitter_frames_trimmed_total", "Voice frames discarded to shrink the jitter buffer delay"
+)
+FRAMES_LATE = registry.counter("dmr_jitter_frames_late_total", "Voice frames dropped for arriving after their playout time")
+ACTIVE_STREAMS = registry.gauge("dmr_jitter_streams", "Voice streams with an active jitter buffer")
+
+# Consumers receive (stream_id, sequence, payload); payload None marks a lost frame
+FrameSink = Callable[[str, int, Optional[bytes]], None]
+
+
+class JitterBuffer:
+    """Adaptive jitter buffer for one voice stream."""
+
+    def __init__(self, frame_duration: float = FRAME_DURATION, target_delay: float = TARGET_DELAY,
+                 min_delay: float = MIN_DELAY, max_delay: float = MAX_DELAY,
+                 slots: int = BUFFER_SLOTS, seq_modulus: int = SEQ_MODULUS, adaptive: bool = True,
+                 max_concealment: float = MAX_CONCEALMENT, settle_time: float = SETTLE_TIME):
+        self.frame_duration = frame_duration
+        self.seq_modulus = seq_modulus
+        self.adaptive = adaptive
+        self.min_frames = max(1, round(min_delay / frame_duration))
+        self.max_frames = min(slots - 1, max(self.min_frames, round(max_delay / frame_duration)))
+        self.target_frames = min(self.max_frames, max(self.min_frames, round(target_delay / frame_duration)))
+        self.max_conceal_ticks = max(1, round(max_concealment / frame_duration))
+        self.settle_ticks = round(settle_time / frame_duration)
+
+        self._slots: List[Optional[Tuple[int, bytes]]] = [None] * slots
+        self._next: Optional[int] = None   # extended sequence number of the next frame to play
+        self._highest: Optional[int] = None
+        self._depth = 0
+        self._playing = False
+        self._started = False               # whether anything has been played since the last reset
+        self._hold = 0                      # ticks to wait before playing after the target grows
+        self._settle = 0                    # ticks of playout left before trimming is allowed
+        self._dry_ticks = 0                 # consecutive ticks the buffer has been empty
+        self._last_arrival: Optional[float] = None
+        self._last_arrival_seq: Optional[int] = None
+        self.last_activity = time.monotonic()
+
+        # Statistics
+        self.jitter = 0.0                   # RFC 3550 interarrival jitter, seconds
+        self.received = 0
+        self.played = 0
+        self.lost = 0
+        self.late = 0
+        self.duplicates = 0
+        self.overflows = 0
+        self.trimmed = 0
+        self.underruns = 0
+
+    def _extend(self, seq: int) -> int:
+        """Map a wrapping sequence number onto the nearest extended sequence number."""
+        reference = self._highest if self._highest is not None else seq
+        half = self.seq_modulus // 2
+        delta = (seq - reference + half) % self.seq_modulus - half
+        return reference + delta
+
+    def push(self, seq: int, payload: bytes, arrival: Optional[float] = None) -> bool:
+        """Add a frame. Returns False if it was dropped as late or duplicate."""
+        arrival = time.monotonic() if arrival is None else arrival
+        self.last_activity = arrival
+        ext = self._extend(seq)
+        self.received += 1
+
+        if self._next is None:
+            self._next = ext
+        elif ext < self._next:
+            if self._started or self._highest - ext >= len(self._slots):
+                self.late += 1
+                FRAMES_LATE.inc()
+                return False
+            # Still prebuffering the first frames: an earlier one arrived after a later one
+            self._next = ext
+        elif ext - self._next >= len(self._slots):
+            # Too far ahead to fit: the sender jumped, so start over from here
+            self.overflows += 1
+            self._reset(ext)
+
+        index = ext % len(self._slots)
+        slot = self._slots[index]
+        if slot is not None and slot[0] == ext:
+            self.duplicates += 1
+            return False
+        self._slots[index] = (ext, payload)
+        self._depth += 1
+        if self._highest is None or ext > self._highest:
+            self._highest = ext
+
+        self._update_jitter(ext, arrival)
+        return True
+
+    def _reset(self, next_seq: int) -> None:
+        self._slots = [None] * len(self._slots)
+        self._depth = 0
+        self._next = next_seq
+        self._highest = next_seq
+        self._playing = False
+        self._started = False
+        self._hold = 0
+        self._last_arrival = None
+
+    def _update_jitter(self, ext: int, arrival: float) -> None:
+        """Update the jitter estimate and, if adaptive, the target delay."""
+        if self._last_arrival is not None:
+            transit_change = (arrival - self._last_arrival) - (ext - self._last_arrival_seq) * self.frame_duration
+            self.jitter += (abs(transit_change) - self.jitter) / 16
+        self._last_arrival = arrival
+        self._last_arrival_seq = ext
+
+        if self.adaptive:
+            wanted = math.ceil(3 * self.jitter / self.frame_duration) + 1
+            wanted = min(self.max_frames, max(self.min_frames, wanted))
+            if wanted > self.target_frames and self._playing:
+                # Grow the delay by pausing playout rather than skipping audio
+                self._hold += wanted - self.target_frames
+            self.target_frames = wanted
+
+    def pop(self) -> Optional[Tuple[int, Optional[bytes]]]:
+        """Take the frame due on this tick.
+
+        Returns None while prebuffering, otherwise (sequence, payload) where
+        payload is None if there is nothing to play on this tick: the frame
+        was lost, the buffer ran dry, or playout is paused to grow the delay.
+        Once the buffer has been dry for max_conceal_ticks the sender is
+        taken to have gone quiet, and playout stops until it refills.
+        """
+        if self._next is None:
+            return None
+        if not self._playing:
+            if self._depth < self.target_frames:
+                return None
+            if self._started:
+                # Resuming after the sender went quiet: nothing between here and the
+                # first buffered frame was sent, so do not conceal it as loss
+                self._next = min(slot[0] for slot in self._slots if slot is not None)
+            self._playing = True
+            self._started = True
+            self._settle = self.settle_ticks
+            self._dry_ticks = 0
+
+        if self._hold or not self._depth:
+            # Conceal without advancing, so frames that are merely delayed still play
+            if self._hold:
+                self._hold -= 1
+            else:
+                self._dry_ticks += 1
+                if self._dry_ticks > self.max_conceal_ticks:
+                    self._playing = False
+                    self._hold = 0
+                    return None
+                self.underruns += 1
+            return self._next % self.seq_modulus, None
+        self._dry_ticks = 0
+
+        # Shrink the delay when the buffer runs well above target, but only
+        # once playout has settled so a startup burst is not thrown away
+        if self._settle:
+            self._settle -= 1
+        elif self._depth > self.target_frames + 2:
+            self._discard(self._next)
+            self._next += 1
+            self.trimmed += 1
+            FRAMES_TRIMMED.inc()
+
+        seq = self._next
+        self._next += 1
+        payload = self._discard(seq)
+        if payload is None:
+            self.lost += 1
+            FRAMES_LOST.inc()
+        else:
+            self.played += 1
+            FRAMES_PLAYED.inc()
+        return seq % self.seq_modulus, payload
+
+    def _discard(self, ext: int) -> Optional[bytes]:
+        index = ext % len(self._slots)
+        slot = self._slots[index]
+        if slot is None or slot[0] != ext:
+            return None
+        self._slots[index] = None
+        self._depth -= 1
+        return slot[1]
+
+    @property
+    def drained(self) -> bool:
+        """Whether every received frame has been played."""
+        return self._depth == 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get jitter and loss statistics."""
+        expected = self.played + self.lost + self.trimmed
+        return {
+            "received": self.received,
+            "played": self.played,
+            "lost": self.lost,
+            "late": self.late,
+            "duplicates": self.duplicates,
+            "overflows": self.overflows,
+            "trimmed": self.trimmed,
+            "underruns": self.underruns,
+            "loss_ratio": round((self.lost + self.trimmed) / expected, 4) if expected else 0.0,
+            "jitter_ms": round(self.jitter * 1000, 2),
+            "target_delay_ms": round(self.target_frames * self.frame_duration * 1000, 1),
+            "depth": self._depth,
+            "playing": self._playing,
+        }
+
+
+class JitterBufferManager:
+    """Runs one playout clock for all active voice streams."""
+
+    def __init__(self, frame_duration: float = FRAME_DURATION, stream_timeout: float = STREAM_TIMEOUT,
+                 **buffer_options):
+        self.frame_duration = frame_duration
+        self.stream_timeout = stream_timeout
+        self.buffer_options = buffer_options
+        self.streams: Dict[str, JitterBuffer] = {}
+        self._sinks: List[FrameSink] = []
+        self._clock_task: Optional[asyncio.Task] = None
+        ACTIVE_STREAMS.set_function(lambda: len(self.streams))
+
+    def add_sink(self, sink: FrameSink) -> None:
+        """Register a consumer (recording, live listening, ASR, ...).
+
+        Sinks run on the playout clock and must not block; hand frames off
+        to a queue for any real work.
+        """
+        self._sinks.append(sink)
+
+    def remove_sink(self, sink: FrameSink) -> None:
+        if sink in self._sinks:
+            self._sinks.remove(sink)
+
+    def push(self, stream_id: str, seq: int, payload: bytes) -> bool:
+        """Add a frame received from the network to its stream's buffer."""
+        buffer = self.streams.get(stream_id)
+        if buffer is None:
+            buffer = JitterBuffer(frame_duration=self.frame_duration, **self.buffer_options)
+            self.streams[stream_id] = buffer
+            logger.debug(f"Voice stream {stream_id} started")
+        accepted = buffer.push(seq, payload)
+        if self._clock_task is None:
+            # The clock only runs while there are streams to play
+            self._clock_task = asyncio.create_task(self._clock())
+        return accepted
+
+    def end_stream(self, stream_id: str) -> Optional[Dict[str, Any]]:
+        """Close a stream and return its final statistics."""
+        buffer = self.streams.pop(stream_id, None)
+        return buffer.get_stats() if buffer else None
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get statistics for every active stream."""
+        return {stream_id: buffer.get_stats() for stream_id, buffer in self.streams.items()}
+
+    async def stop(self) -> None:
+        if self._clock_task:
+            self._clock_task.cancel()
+            try:
+                await self._clock_task
+            except asyncio.CancelledError:
+                pass
+            self._clock_task = None
+
+    def _tick(self, now: float) -> None:
+        for stream_id, buffer in list(self.streams.items()):
+            frame = buffer.pop()
+            if frame is not None:
+                seq, payload = frame
+                for sink in self._sinks:
+                    try:
+                        sink(stream_id, seq, payload)
+                    except Exception as e:
+                        logger.error(f"Error in voice frame sink: {e}")
+            if buffer.drained and now - buffer.last_activity > self.stream_timeout:
+                self.end_stream(stream_id)
+                logger.debug(f"Voice stream {stream_id} ended")
+
+    async def _clock(self):
+        """Pop one frame per stream every frame_duration, against an absolute schedule."""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        try:
+            while self.streams:
+                next_tick += self.frame_duration
+                delay = next_tick - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                behind = int((loop.time() - next_tick) / self.frame_duration)
+                if behind > MAX_CATCHUP_TICKS:
+                    # Too far behind to catch up audibly; resynchronize the schedule
+                    next_tick = loop.time()
+                    behind = 0
+                for _ in range(behind + 1):
+                    self._tick(time.monotonic())
+                next_tick += behind * self.frame_duration
+        finally:
+            self._clock_task = None
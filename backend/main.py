@@ -5,18 +5,30 @@ This module initializes the FastAPI application, sets up WebSocket connections,
 and defines the API endpoints for the DMR Libertas platform.
 """
 import asyncio
+import hmac
 import json
 import logging
 import os
+import time
+import uuid
 from typing import Dict, List, Optional
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel, Field
 
 from serial_handler import DMRSerialHandler
 from websocket_manager import ConnectionManager
-from audio_handler import AudioHandler
+from metrics import registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from diagnostics import LoopWatchdog, SamplingProfiler
+from tx_scheduler import TxScheduler, TxRejected, Priority, JobStatus
+from status_cache import StatusCache
+from radio_bus import RadioBusServer, RadioBusClient, RadioBusError
+from track_store import TrackStore, DEFAULT_POINT_BUDGET
+from plugins import PluginManager, PluginContext
+from analytics import ActivityAnalytics, WINDOWS as STATS_WINDOWS, DEFAULT_TOP_K
+from jitter_buffer import JitterBufferManager
 
 # Configure logging
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
@@ -37,12 +49,86 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Process role:
+#   local  - single process that owns the radio and serves the API (default)
+#   owner  - owns the radio and publishes events to API workers over the radio bus
+#   worker - stateless API/WebSocket worker fed by the owner; safe to run with --workers N
+RADIO_MODE = os.getenv("RADIO_MODE", "local").lower()
+if RADIO_MODE not in ("local", "owner", "worker"):
+    raise ValueError(f"Invalid RADIO_MODE: {RADIO_MODE}")
+
 # Initialize components
-serial_handler = DMRSerialHandler()
-ws_manager = ConnectionManager()
-audio_handler = AudioHandler()
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))
+WS_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", "20"))
+ws_manager = ConnectionManager(
+    ping_interval=WS_PING_INTERVAL,
+    ping_timeout=WS_PING_TIMEOUT,
+    max_per_ip=int(os.getenv("WS_MAX_PER_IP", "32")),
+)
+serial_handler = None
+plugin_manager = None
+tx_scheduler = None
+track_store = None
+analytics = None
+voice_buffers = None
+transcript_listeners: List = []  # Filled by plugins such as translation
+bus_server = None
+bus_client = None
+
+if RADIO_MODE == "worker":
+    # Workers never touch the hardware; radio state is mirrored from the owner
+    bus_client = RadioBusClient(on_event=lambda message: deliver_event(message["message"], message.get("topics")))
+    radio_state = bus_client.state
+else:
+    serial_handler = DMRSerialHandler()
+    # Optional subsystems (audio, AI, ...) are imported only if enabled in PLUGINS
+    plugin_manager = PluginManager()
+    tx_scheduler = TxScheduler(serial_handler)
+    track_store = TrackStore(
+        capacity=int(os.getenv("TRACK_MAX_POINTS", "17280")),
+        max_radios=int(os.getenv("TRACK_MAX_RADIOS", "256")),
+    )
+    analytics = ActivityAnalytics()
+    # Network voice clients push frames here; sinks receive them on a steady 20 ms clock
+    voice_buffers = JitterBufferManager(
+        target_delay=float(os.getenv("JITTER_TARGET_DELAY", "0.060")),
+        adaptive=os.getenv("JITTER_ADAPTIVE", "true").lower() == "true",
+    )
+    radio_state = serial_handler
+    if RADIO_MODE == "owner":
+        bus_server = RadioBusServer()
+
+loop_watchdog = LoopWatchdog(
+    interval=float(os.getenv("LOOP_LAG_INTERVAL", "0.1")),
+    threshold=float(os.getenv("LOOP_LAG_THRESHOLD", "0.25")),
+)
+profiler = SamplingProfiler()
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+LOCAL_RADIO_ID = os.getenv("RADIO_ID", "local")  # Track ID for fixes that don't name their radio
+STATS_INTERVAL = float(os.getenv("STATS_INTERVAL", "5"))  # seconds between "stats" topic updates
+
+# Metrics
+metrics_registry.gauge("dmr_radio_connected", "Whether the radio is connected", func=lambda: int(radio_state.connected))
+metrics_registry.gauge("dmr_ws_clients", "Connected WebSocket clients", func=lambda: ws_manager.get_client_count())
+metrics_registry.gauge(
+    "dmr_ws_send_queue_depth", "In-flight sends summed across all clients",
+    func=lambda: ws_manager.get_queue_depth()["total"]
+)
+metrics_registry.gauge(
+    "dmr_ws_send_queue_depth_max", "In-flight sends on the most backed-up client",
+    func=lambda: ws_manager.get_queue_depth()["max"]
+)
 
 # Models
+class TranscriptSegment(BaseModel):
+    """A transcribed stretch of radio audio."""
+    text: str = Field(..., description="Transcribed text")
+    radio_id: Optional[str] = Field(None, description="Radio the audio was received on")
+    talkgroup: Optional[int] = Field(None, description="Talkgroup of the call")
+    caller_id: Optional[int] = Field(None, description="DMR ID of the caller")
+    language: Optional[str] = Field(None, description="Detected language code, e.g. \"en\"")
+
+
 class RadioStatus(BaseModel):
     """Current status of the DMR radio."""
     connected: bool = Field(..., description="Whether the radio is connected")
@@ -54,36 +140,155 @@ class RadioStatus(BaseModel):
     last_heard: Optional[dict] = Field(None, description="Last transmission heard")
 
 
+# Event delivery
+async def deliver_event(message: Dict, topics: Optional[List[str]] = None):
+    """Deliver an event to this process's WebSocket clients."""
+    if topics is None:
+        await ws_manager.broadcast_json(message)
+    else:
+        for topic in topics:
+            await ws_manager.publish(topic, message)
+
+
+async def emit_event(message: Dict, topics: Optional[List[str]] = None):
+    """Deliver an event to WebSocket clients in this process and every API worker."""
+    if bus_server:
+        bus_server.publish({"type": "event", "message": message, "topics": topics})
+    await deliver_event(message, topics)
+
+
+def status_snapshot() -> Dict:
+    """Radio status message for API workers."""
+    return {
+        "type": "status",
+        "epoch": bus_server.epoch,
+        "version": serial_handler.state_version,
+        "data": {
+            "connected": serial_handler.connected,
+            "radio_model": serial_handler.radio_model,
+            "firmware_version": serial_handler.firmware_version,
+            "rssi": serial_handler.rssi,
+            "battery_level": serial_handler.battery_level,
+            "gps_data": serial_handler.gps_data,
+            "last_transmission": serial_handler.last_transmission,
+        },
+    }
+
+
 # Background task for monitoring serial data
+_last_call = None
+
+
+def ingest_radio_data(data: Dict):
+    """Feed a radio update into the GPS track store and activity analytics."""
+    global _last_call
+    if data.get("gps"):
+        track_store.add_fix(str(data.get("radio_id") or LOCAL_RADIO_ID), data["gps"])
+    
+    call = data.get("last_heard")
+    if call:
+        # Updates repeat the last call heard until a new one arrives
+        key = (call.get("caller_id"), call.get("talkgroup"), call.get("time"))
+        if key != _last_call:
+            _last_call = key
+            analytics.record_call(call.get("talkgroup"), call.get("caller_id"),
+                                  airtime=call.get("duration") or 0.0, timestamp=call.get("time"))
+
+
 async def monitor_serial():
     """Background task to monitor serial data and broadcast via WebSockets."""
     while True:
         try:
-            if serial_handler.connected:
-                data = await serial_handler.read_data()
-                if data:
-                    # Broadcast to all connected WebSocket clients
-                    await ws_manager.broadcast_json({
-                        "type": "radio_update",
-                        "data": data
-                    })
-            await asyncio.sleep(0.1)
+            # Parsed frames come from the serial handler's read loop, the port's only reader
+            data = await serial_handler.read_data()
+            try:
+                ingest_radio_data(data)
+            except Exception as e:
+                # A malformed field must not keep the update from clients
+                logger.error(f"Error ingesting radio data: {e!r}")
+            # Broadcast to all connected WebSocket clients
+            await emit_event({
+                "type": "radio_update",
+                "data": data
+            })
         except Exception as e:
             logger.error(f"Error in serial monitor: {e}")
             await asyncio.sleep(1)
 
 
+async def publish_stats():
+    """Background task to publish activity statistics on the "stats" topic."""
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        try:
+            await emit_event({"type": "stats", "data": analytics.get_stats()}, topics=["stats"])
+        except Exception as e:
+            logger.error(f"Error publishing stats: {e}")
+
+
+async def publish_status_changes():
+    """Background task to push radio status changes to API workers."""
+    version = serial_handler.state_version
+    while True:
+        version = await serial_handler.wait_for_state_version(version + 1)
+        bus_server.publish(status_snapshot())
+
+
+async def publish_tx_status(job):
+    """Publish transmit job status changes to WebSocket subscribers."""
+    await emit_event({"type": "tx_status", "data": job.to_dict()}, topics=["tx", f"tx:{job.job_id}"])
+
+
+async def publish_link_change(event: Dict):
+    """Tell WebSocket clients when the radio link drops or comes back."""
+    await emit_event({"type": "radio_link", "data": event})
+
+
+if tx_scheduler:
+    tx_scheduler.on_status = publish_tx_status
+    serial_handler.on_link_change = publish_link_change
+
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
     """Initialize components on application startup."""
-    logger.info("Starting DMR Libertas...")
+    logger.info(f"Starting DMR Libertas ({RADIO_MODE} mode)...")
+    
+    if bus_client:
+        await bus_client.start()
+    else:
+        # Start serial handler; the supervisor reconnects it if the link drops
+        await serial_handler.connect()
+        serial_handler.start_supervisor()
+        
+        # Start background tasks
+        asyncio.create_task(monitor_serial())
+        asyncio.create_task(publish_stats())
+        await tx_scheduler.start()
+        
+        # Start enabled plugins
+        await plugin_manager.start_all(PluginContext(
+            app=app, ws_manager=ws_manager, serial_handler=serial_handler, emit_event=emit_event,
+            voice_buffers=voice_buffers, publish_transcript=publish_transcript,
+            transcript_listeners=transcript_listeners
+        ))
     
-    # Start serial handler
-    await serial_handler.connect()
+    if bus_server:
+        bus_server.snapshot = lambda: [status_snapshot()]
+        bus_server.register("transmit", submit_transmit)
+        bus_server.register("transmit_status", get_transmit_job)
+        bus_server.register("audio", set_audio_capture)
+        bus_server.register("audio_channels", get_audio_channels)
+        bus_server.register("tracks", query_tracks)
+        bus_server.register("stats", get_activity_stats)
+        bus_server.register("voice_streams", get_voice_stream_stats)
+        bus_server.register("transcript", publish_transcript)
+        await bus_server.start()
+        asyncio.create_task(publish_status_changes())
     
-    # Start background tasks
-    asyncio.create_task(monitor_serial())
+    ws_manager.start()
+    loop_watchdog.start()
     
     logger.info("DMR Libertas started successfully")
 
@@ -92,7 +297,17 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on application shutdown."""
     logger.info("Shutting down DMR Libertas...")
-    await serial_handler.disconnect()
+    await loop_watchdog.stop()
+    await ws_manager.stop()
+    if bus_server:
+        await bus_server.stop()
+    if bus_client:
+        await bus_client.stop()
+    else:
+        await plugin_manager.stop_all()
+        await voice_buffers.stop()
+        await tx_scheduler.stop()
+        await serial_handler.disconnect()
     logger.info("Shutdown complete")
 
 
@@ -100,41 +315,333 @@ async def shutdown_event():
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time updates."""
-    await ws_manager.connect(websocket)
+    client_id = await ws_manager.connect(websocket)
+    if client_id is None:
+        return  # Refused by the per-IP connection cap
     try:
         while True:
-            # Keep connection alive
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            ws_manager.mark_alive(client_id)
+            await handle_client_message(client_id, text)
     except WebSocketDisconnect:
+        pass
+    finally:
         ws_manager.disconnect(websocket)
 
 
-# REST API endpoints
-@app.get("/api/status", response_model=RadioStatus)
-async def get_radio_status():
-    """Get current radio status."""
-    return {
-        "connected": serial_handler.connected,
-        "model": serial_handler.radio_model,
-        "firmware": serial_handler.firmware_version,
-        "rssi": serial_handler.rssi,
-        "battery": serial_handler.battery_level,
-        "gps": serial_handler.gps_data,
-        "last_heard": serial_handler.last_transmission
-    }
+async def handle_client_message(client_id: str, text: str):
+    """Handle a control message sent by a WebSocket client.
+    
+    Supported actions:
+        {"action": "subscribe", "topic": "tx"}
+        {"action": "unsubscribe", "topic": "tx"}
+        {"action": "tx_wait", "job_id": "..."}  - replies with tx_status when the job finishes
+        {"action": "heartbeat", "enabled": true} - opts in to (or out of) JSON pings
+        {"action": "pong"}                       - answers a server {"type": "ping"}
+    
+    Dead connections are detected with protocol-level ping frames, so
+    passive clients never have to send anything. Clients that opt in to
+    the heartbeat (e.g. browsers, which cannot see ping frames) receive
+    {"type": "ping"} after WS_PING_INTERVAL of silence and are disconnected
+    if they send nothing within WS_PING_TIMEOUT.
+    """
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return  # Plain keepalive text
+    if not isinstance(message, dict):
+        return
+    
+    action = message.get("action")
+    if action == "subscribe" and message.get("topic"):
+        await ws_manager.subscribe(client_id, message["topic"])
+    elif action == "unsubscribe" and message.get("topic"):
+        await ws_manager.unsubscribe(client_id, message["topic"])
+    elif action == "tx_wait" and message.get("job_id"):
+        asyncio.create_task(_reply_when_done(client_id, message["job_id"]))
+    elif action == "heartbeat":
+        ws_manager.set_heartbeat(client_id, bool(message.get("enabled", True)))
+
+
+async def _reply_when_done(client_id: str, job_id: str):
+    """Send a job's final status to one client once it finishes."""
+    try:
+        job = await get_transmit_job(job_id)
+        while job["status"] not in (JobStatus.SENT, JobStatus.FAILED):
+            job = await get_transmit_job(job_id, wait=TX_MAX_WAIT)
+    except HTTPException as e:
+        await ws_manager.send_personal_message(client_id, {"type": "error", "message": e.detail})
+        return
+    await ws_manager.send_personal_message(client_id, {"type": "tx_status", "data": job})
+
 
+# Radio operations, run locally or forwarded to the radio owner
+TX_MAX_WAIT = 60.0  # seconds
 
-@app.post("/api/transmit")
-async def transmit_message(message: str):
-    """Transmit a message via the radio."""
-    if not serial_handler.connected:
+
+async def _bus_request(op: str, **params):
+    """Forward an operation to the radio owner."""
+    try:
+        return await bus_client.request(op, **params)
+    except RadioBusError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+
+
+async def submit_transmit(message: str, user: str, priority: str = "normal") -> Dict:
+    """Queue a transmission and return its job."""
+    if bus_client:
+        return await _bus_request("transmit", message=message, user=user, priority=priority)
+    
+    # During a reconnect window jobs are queued and sent once the radio is back
+    if not serial_handler.connected and not serial_handler.reconnecting:
         raise HTTPException(status_code=503, detail="Radio not connected")
     
     try:
-        await serial_handler.send_message(message)
-        return {"status": "success", "message": "Message transmitted"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        tx_priority = Priority[priority.upper()]
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown priority: {priority}")
+    
+    try:
+        job = tx_scheduler.submit(message, user=user, priority=tx_priority)
+    except TxRejected as e:
+        headers = {"Retry-After": str(int(e.retry_after) + 1)} if e.retry_after is not None else None
+        raise HTTPException(status_code=429, detail=str(e), headers=headers)
+    return job.to_dict()
+
+
+async def get_transmit_job(job_id: str, wait: float = 0.0) -> Dict:
+    """Get a transmit job, optionally waiting up to `wait` seconds for it to finish."""
+    if bus_client:
+        return await _bus_request("transmit_status", job_id=job_id, wait=wait)
+    
+    job = tx_scheduler.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    
+    if wait > 0:
+        try:
+            await tx_scheduler.wait(job_id, timeout=min(wait, TX_MAX_WAIT))
+        except asyncio.TimeoutError:
+            pass
+    return job.to_dict()
+
+
+async def set_audio_capture(enabled: bool) -> bool:
+    """Start or stop audio capture."""
+    if bus_client:
+        return await _bus_request("audio", enabled=enabled)
+    
+    audio = plugin_manager.get("audio")
+    if audio is None:
+        raise HTTPException(status_code=503, detail="Audio plugin not enabled")
+    if enabled:
+        return await audio.handler.start()
+    await audio.handler.stop()
+    return True
+
+
+async def get_audio_channels() -> List[Dict]:
+    """Get the audio channel map with per-radio level and speech state."""
+    if bus_client:
+        return await _bus_request("audio_channels")
+    
+    audio = plugin_manager.get("audio")
+    if audio is None:
+        raise HTTPException(status_code=503, detail="Audio plugin not enabled")
+    return audio.handler.get_channels()
+
+
+# REST API endpoints
+def render_radio_status() -> bytes:
+    """Serialize the current radio status."""
+    return RadioStatus(
+        connected=radio_state.connected,
+        model=radio_state.radio_model,
+        firmware=radio_state.firmware_version,
+        rssi=radio_state.rssi,
+        battery=radio_state.battery_level,
+        gps=radio_state.gps_data,
+        last_heard=radio_state.last_transmission,
+    ).json().encode()
+
+
+def status_epoch() -> Optional[str]:
+    """Owner run the status version belongs to; None in local mode, which has only one."""
+    if bus_client:
+        return bus_client.state.state_epoch
+    if bus_server:
+        return bus_server.epoch
+    return None
+
+
+status_cache = StatusCache(lambda: radio_state.state_version, render_radio_status, status_epoch)
+STATUS_MAX_WAIT = 60.0  # seconds
+
+
+@app.get("/api/status", response_model=RadioStatus)
+async def get_radio_status(
+    wait_for_version: Optional[int] = None,
+    timeout: float = 30.0,
+    if_none_match: Optional[str] = Header(None),
+):
+    """Get current radio status.
+    
+    The response carries an ETag and an X-State-Version header. Sending the
+    ETag back in If-None-Match returns 304 while the state is unchanged.
+    With wait_for_version=N the request blocks (up to timeout seconds) until
+    the state version reaches N, so pollers pass their last version + 1.
+    Behind several API workers every worker reports the radio owner's
+    version; if the owner restarts or becomes unreachable the request
+    returns early and the version may start over, so always continue from
+    the returned X-State-Version.
+    """
+    if wait_for_version is not None:
+        await radio_state.wait_for_state_version(
+            wait_for_version, timeout=max(0.0, min(timeout, STATUS_MAX_WAIT))
+        )
+    
+    version, body, etag = status_cache.get()
+    headers = {"ETag": etag, "X-State-Version": str(version), "Cache-Control": "no-cache"}
+    if status_cache.matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+UNKNOWN_CLIENT = "unknown"  # Rate limit key shared by clients without an address (e.g. uvicorn --uds)
+
+
+def _client_key(request: Request) -> str:
+    """Identify the client for rate limiting by its address."""
+    # Depending on the Starlette version a missing address is client None or host None
+    if request.client is None or not request.client.host:
+        return UNKNOWN_CLIENT
+    return request.client.host
+
+
+@app.post("/api/transmit", status_code=202)
+async def transmit_message(request: Request, message: str, priority: str = "normal",
+                           x_admin_token: Optional[str] = Header(None)):
+    """Queue a message for transmission via the radio.
+    
+    Returns a job ID immediately; the job's progress is published on the
+    WebSocket topics "tx" and "tx:<job_id>". Rate limits apply per client
+    address. Emergency priority skips them and needs admin authorization.
+    """
+    if priority.lower() == "emergency":
+        _check_admin(request, x_admin_token)
+    job = await submit_transmit(message, user=_client_key(request), priority=priority)
+    return {"status": "queued", "job_id": job["job_id"]}
+
+
+@app.get("/api/transmit/{job_id}")
+async def get_transmit_status(job_id: str, wait: float = 0.0):
+    """Get the status of a transmit job, optionally waiting up to `wait` seconds for it to finish."""
+    return await get_transmit_job(job_id, wait=wait)
+
+
+MAX_TRACK_POINTS = 20000
+
+
+async def query_tracks(radio_ids: Optional[List[str]] = None, since: Optional[float] = None,
+                       until: Optional[float] = None, bbox: Optional[List[float]] = None,
+                       max_points: int = DEFAULT_POINT_BUDGET, method: str = "dp") -> List[Dict]:
+    """Query simplified GPS tracks."""
+    if bus_client:
+        return await _bus_request("tracks", radio_ids=radio_ids, since=since, until=until,
+                                  bbox=bbox, max_points=max_points, method=method)
+    return track_store.query(radio_ids, since=since, until=until, bbox=bbox,
+                             max_points=max_points, method=method)
+
+
+@app.get("/api/tracks")
+async def get_tracks(
+    radio_id: Optional[List[str]] = Query(None),
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    bbox: Optional[str] = None,
+    max_points: int = DEFAULT_POINT_BUDGET,
+    method: str = "dp",
+):
+    """Get GPS tracks for the map.
+    
+    Tracks are filtered by time range and an optional bounding box
+    ("min_lon,min_lat,max_lon,max_lat"), then simplified so all returned
+    tracks together hold at most max_points points. method is "dp"
+    (Douglas-Peucker, shape-preserving) or "bucket" (even time spacing).
+    Each point is [timestamp, lat, lon, alt].
+    """
+    box = None
+    if bbox:
+        try:
+            box = [float(value) for value in bbox.split(",")]
+        except ValueError:
+            box = []
+        if len(box) != 4:
+            raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    if method not in ("dp", "bucket"):
+        raise HTTPException(status_code=400, detail=f"Unknown method: {method}")
+    
+    tracks = await query_tracks(radio_id, since=since, until=until, bbox=box,
+                                max_points=max(2, min(max_points, MAX_TRACK_POINTS)), method=method)
+    return {"tracks": tracks}
+
+
+async def get_activity_stats(window: Optional[str] = None, limit: int = DEFAULT_TOP_K) -> Dict:
+    """Get sliding-window activity statistics."""
+    if bus_client:
+        return await _bus_request("stats", window=window, limit=limit)
+    return analytics.get_stats(window, limit)
+
+
+@app.get("/api/stats")
+async def get_stats(window: Optional[str] = None, limit: int = DEFAULT_TOP_K):
+    """Get the busiest talkgroups and callers.
+    
+    Calls and airtime per talkgroup and per caller over sliding 1m, 15m and
+    1h windows (or just the one named by window). The same data is pushed
+    every STATS_INTERVAL seconds on the WebSocket topic "stats".
+    """
+    if window is not None and window not in STATS_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {', '.join(STATS_WINDOWS)}")
+    return await get_activity_stats(window, max(1, min(limit, 100)))
+
+
+async def get_voice_stream_stats() -> Dict:
+    """Get jitter buffer statistics for active voice streams."""
+    if bus_client:
+        return await _bus_request("voice_streams")
+    return voice_buffers.get_stats()
+
+
+@app.get("/api/voice/streams")
+async def get_voice_streams():
+    """Get jitter, loss and buffer delay for each active network voice stream."""
+    return {"streams": await get_voice_stream_stats()}
+
+
+async def publish_transcript(segment: Dict) -> Dict:
+    """Publish a transcript segment on the "transcript" topic and hand it to listeners."""
+    if bus_client:
+        return await _bus_request("transcript", segment=segment)
+    
+    segment = dict(segment, segment_id=segment.get("segment_id") or uuid.uuid4().hex,
+                   timestamp=segment.get("timestamp") or time.time())
+    await emit_event({"type": "transcript", "data": segment}, topics=["transcript"])
+    for listener in transcript_listeners:
+        # Listeners may be slow (translation); never hold up the transcript itself
+        asyncio.create_task(listener(segment))
+    return segment
+
+
+@app.post("/api/transcripts", status_code=202)
+async def post_transcript(segment: TranscriptSegment):
+    """Publish a transcript segment from a transcription service.
+    
+    The segment is sent on the WebSocket topic "transcript", followed by
+    translations when the translation plugin is enabled.
+    """
+    published = await publish_transcript(segment.dict())
+    return {"status": "published", "segment_id": published["segment_id"]}
 
 
 # Audio handling endpoints
@@ -142,8 +649,10 @@ async def transmit_message(message: str):
 async def start_audio_capture():
     """Start capturing and processing audio."""
     try:
-        await audio_handler.start()
+        await set_audio_capture(True)
         return {"status": "success", "message": "Audio capture started"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -152,12 +661,20 @@ async def start_audio_capture():
 async def stop_audio_capture():
     """Stop audio capture."""
     try:
-        await audio_handler.stop()
+        await set_audio_capture(False)
         return {"status": "success", "message": "Audio capture stopped"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/audio/channels")
+async def list_audio_channels():
+    """Get each captured channel, the radio it belongs to, and its current level."""
+    return {"channels": await get_audio_channels()}
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -165,11 +682,75 @@ async def health_check():
     return {
         "status": "ok",
         "version": "0.1.0",
-        "radio_connected": serial_handler.connected,
-        "ws_clients": len(ws_manager.active_connections)
+        "mode": RADIO_MODE,
+        "radio_connected": radio_state.connected,
+        "ws_clients": len(ws_manager.active_connections),
+        "bus_connected": bus_client.connected if bus_client else None,
+        "bus_workers": bus_server.get_worker_count() if bus_server else None,
     }
 
 
+# Metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    """Expose metrics in the Prometheus text format."""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+# Admin endpoints
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def _check_admin(request: Request, token: Optional[str]) -> None:
+    """Reject the request unless it carries the admin token.
+    
+    Without ADMIN_TOKEN configured, admin endpoints only answer loopback clients.
+    """
+    if ADMIN_TOKEN:
+        if not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif request.client is None or request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Set ADMIN_TOKEN to use admin endpoints remotely")
+
+
+@app.get("/api/admin/loop")
+async def get_loop_stats(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Get event loop watchdog statistics."""
+    _check_admin(request, x_admin_token)
+    return loop_watchdog.get_stats()
+
+
+@app.get("/api/admin/plugins")
+async def get_plugin_report(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Get the plugin startup timing report."""
+    _check_admin(request, x_admin_token)
+    if plugin_manager is None:
+        return {"plugins": [], "available": {}}
+    return {"plugins": plugin_manager.get_report(), "available": plugin_manager.available()}
+
+
+@app.get("/api/admin/profile", response_class=PlainTextResponse)
+async def capture_profile(
+    request: Request,
+    seconds: float = 10.0,
+    interval: float = 0.005,
+    loop_only: bool = False,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """Capture a sampling profile of the running server as collapsed stacks."""
+    _check_admin(request, x_admin_token)
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    thread_id = loop_watchdog.loop_thread_id if loop_only else None
+    try:
+        stacks = await profiler.profile(seconds, interval, thread_id=thread_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(stacks)
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True,
+                ws_ping_interval=WS_PING_INTERVAL, ws_ping_timeout=WS_PING_TIMEOUT)
\ No newline at end of file
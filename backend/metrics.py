@@ -0,0 +1,206 @@
+"""
+Metrics for DMR Libertas
+
+This module provides lightweight in-process counters, gauges and histograms
+and renders them in the Prometheus text exposition format.
+Observations only update preallocated slots, so instrumenting hot paths is cheap.
+"""
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Default histogram buckets (seconds), tuned for sub-millisecond to multi-second work
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value for the exposition format."""
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing counter."""
+    __slots__ = ("name", "description", "value")
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: Union[int, float] = 1) -> None:
+        """Increment the counter."""
+        self.value += amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.value)}"]
+
+
+class Gauge:
+    """Value that can go up and down, or be computed on demand at scrape time."""
+    __slots__ = ("name", "description", "value", "_func")
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, func: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self._func = func
+
+    def set(self, value: Union[int, float]) -> None:
+        self.value = value
+
+    def inc(self, amount: Union[int, float] = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: Union[int, float] = 1) -> None:
+        self.value -= amount
+
+    def set_function(self, func: Callable[[], float]) -> None:
+        """Compute the gauge value by calling func at scrape time."""
+        self._func = func
+
+    def get(self) -> float:
+        if self._func is not None:
+            try:
+                return self._func()
+            except Exception:
+                return math.nan
+        return self.value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.get())}"]
+
+
+class Histogram:
+    """Fixed-bucket histogram."""
+    __slots__ = ("name", "description", "bounds", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.bounds = tuple(sorted(buckets))
+        # One slot per bound plus the implicit +Inf bucket
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record a single observation."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{_format_value(float(bound))}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class RateMeter:
+    """Per-second rate gauge updated from a running total.
+
+    The rate is recomputed at most once per window, so mark() costs two
+    additions and a clock read.
+    """
+    __slots__ = ("name", "description", "value", "_acc", "_window_start", "_window")
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, window: float = 1.0):
+        self.name = name
+        self.description = description
+        self.value = 0.0
+        self._acc = 0
+        self._window = window
+        self._window_start = time.monotonic()
+
+    def mark(self, amount: Union[int, float] = 1) -> None:
+        """Record amount units of work."""
+        self._acc += amount
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= self._window:
+            self.value = self._acc / elapsed
+            self._acc = 0
+            self._window_start = now
+
+    def get(self) -> float:
+        # Decay to zero when nothing has been marked for a while
+        if time.monotonic() - self._window_start > 2 * self._window:
+            return 0.0
+        return self.value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.get())}"]
+
+
+Metric = Union[Counter, Gauge, Histogram, RateMeter]
+
+
+class MetricsRegistry:
+    """Collection of named metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        existing = self._metrics.get(name)
+        if existing is not None:
+            if not isinstance(existing, cls):
+                raise ValueError(f"Metric {name} already registered as {existing.kind}")
+            return existing
+        metric = cls(name, *args, **kwargs)
+        self._metrics[name] = metric
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        """Get or create a counter."""
+        return self._register(Counter, name, description)
+
+    def gauge(self, name: str, description: str, func: Optional[Callable[[], float]] = None) -> Gauge:
+        """Get or create a gauge."""
+        gauge = self._register(Gauge, name, description)
+        if func is not None:
+            gauge.set_function(func)
+        return gauge
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        return self._register(Histogram, name, description, buckets=buckets)
+
+    def rate(self, name: str, description: str, window: float = 1.0) -> RateMeter:
+        """Get or create a per-second rate gauge."""
+        return self._register(RateMeter, name, description, window=window)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+registry = MetricsRegistry()
@@ -0,0 +1,199 @@
+"""
+Plugin System for DMR Libertas
+
+This module discovers optional subsystems (audio, AI transcription, database
+logging, network clients, ...) and only imports and starts the ones enabled
+in configuration, so a serial-only deployment never pays for the others.
+
+Plugins are found in two places:
+    - BUILTIN_PLUGINS, for subsystems that ship in this tree
+    - the "dmr_libertas.plugins" entry point group, for installed packages
+
+Either way a plugin is a "module:attribute" reference to a Plugin subclass,
+and nothing is imported until the plugin is enabled.
+"""
+import importlib
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "dmr_libertas.plugins"
+
+# Plugins shipped with the backend
+BUILTIN_PLUGINS = {
+    "audio": "audio_handler:AudioPlugin",
+    "translation": "translation:TranslationPlugin",
+}
+
+# Enabled when PLUGINS is not set
+DEFAULT_PLUGINS = "audio"
+
+
+@dataclass
+class PluginContext:
+    """Services the application shares with plugins."""
+    app: Any
+    ws_manager: Any
+    serial_handler: Any
+    emit_event: Callable[..., Awaitable[None]]
+    voice_buffers: Any = None  # JitterBufferManager for network voice streams
+    publish_transcript: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None
+    # Called with every published transcript segment (translation, keyword spotting, ...)
+    transcript_listeners: List[Callable[[Dict[str, Any]], Awaitable[None]]] = field(default_factory=list)
+    config: Dict[str, str] = field(default_factory=lambda: dict(os.environ))
+
+
+class Plugin:
+    """Base class for plugins."""
+    name = "plugin"
+
+    async def start(self, context: PluginContext) -> None:
+        """Start the plugin."""
+
+    async def stop(self) -> None:
+        """Stop the plugin."""
+
+
+@dataclass
+class PluginRecord:
+    """Load state and startup cost of one plugin."""
+    name: str
+    target: str
+    status: str = "pending"
+    import_seconds: float = 0.0
+    start_seconds: float = 0.0
+    modules_loaded: int = 0
+    error: Optional[str] = None
+    instance: Optional[Plugin] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "target": self.target,
+            "status": self.status,
+            "import_ms": round(self.import_seconds * 1000, 1),
+            "start_ms": round(self.start_seconds * 1000, 1),
+            "modules_loaded": self.modules_loaded,
+            "error": self.error,
+        }
+
+
+def enabled_plugins_from_env() -> List[str]:
+    """Read the enabled plugin names from the PLUGINS environment variable."""
+    value = os.getenv("PLUGINS", DEFAULT_PLUGINS)
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def _entry_point_targets() -> Dict[str, str]:
+    """Map entry point names to their "module:attribute" targets without importing them."""
+    try:
+        from importlib.metadata import entry_points
+        eps = entry_points()
+        if hasattr(eps, "select"):
+            group = eps.select(group=ENTRY_POINT_GROUP)
+        else:
+            group = eps.get(ENTRY_POINT_GROUP, [])
+        return {ep.name: ep.value for ep in group}
+    except Exception as e:
+        logger.warning(f"Error reading plugin entry points: {e}")
+        return {}
+
+
+def _load_target(target: str):
+    """Import "module:attribute" and return the attribute."""
+    module_name, _, attribute = target.partition(":")
+    obj = importlib.import_module(module_name)
+    for part in attribute.split(".") if attribute else ():
+        obj = getattr(obj, part)
+    return obj
+
+
+class PluginManager:
+    """Loads, starts and stops the enabled plugins."""
+
+    def __init__(self, enabled: Optional[List[str]] = None, builtins: Optional[Dict[str, str]] = None):
+        self.enabled = enabled if enabled is not None else enabled_plugins_from_env()
+        self.builtins = builtins if builtins is not None else BUILTIN_PLUGINS
+        self.records: Dict[str, PluginRecord] = {}
+
+    def available(self) -> Dict[str, str]:
+        """Get every known plugin name and target, without importing anything."""
+        targets = dict(self.builtins)
+        targets.update(_entry_point_targets())
+        return targets
+
+    def _resolve(self) -> Dict[str, str]:
+        # Only scan installed packages when an enabled plugin isn't built in
+        if all(name in self.builtins for name in self.enabled):
+            return self.builtins
+        return self.available()
+
+    def get(self, name: str) -> Optional[Plugin]:
+        """Get a running plugin by name."""
+        record = self.records.get(name)
+        if record is None or record.status != "running":
+            return None
+        return record.instance
+
+    async def start_all(self, context: PluginContext) -> None:
+        """Import and start every enabled plugin, timing each one."""
+        targets = self._resolve()
+        for name in self.enabled:
+            target = targets.get(name)
+            record = PluginRecord(name=name, target=target or "")
+            self.records[name] = record
+            if target is None:
+                record.status = "missing"
+                record.error = "No such plugin"
+                logger.error(f"Plugin {name} is enabled but not installed")
+                continue
+
+            try:
+                modules_before = len(sys.modules)
+                started = time.perf_counter()
+                plugin_class = _load_target(target)
+                record.import_seconds = time.perf_counter() - started
+                record.modules_loaded = len(sys.modules) - modules_before
+
+                started = time.perf_counter()
+                record.instance = plugin_class()
+                await record.instance.start(context)
+                record.start_seconds = time.perf_counter() - started
+                record.status = "running"
+            except Exception as e:
+                record.status = "failed"
+                record.error = str(e)
+                logger.error(f"Failed to start plugin {name}: {e}")
+
+        self._log_report()
+
+    async def stop_all(self) -> None:
+        """Stop running plugins in reverse start order."""
+        for record in reversed(list(self.records.values())):
+            if record.status != "running":
+                continue
+            try:
+                await record.instance.stop()
+                record.status = "stopped"
+            except Exception as e:
+                logger.error(f"Error stopping plugin {record.name}: {e}")
+
+    def get_report(self) -> List[Dict[str, Any]]:
+        """Get the startup timing report."""
+        return [record.to_dict() for record in self.records.values()]
+
+    def _log_report(self) -> None:
+        if not self.records:
+            logger.info("No plugins enabled")
+            return
+        lines = [
+            f"  {r.name:<16} {r.status:<8} import {r.import_seconds * 1000:7.1f} ms  "
+            f"start {r.start_seconds * 1000:7.1f} ms  modules +{r.modules_loaded}"
+            for r in self.records.values()
+        ]
+        logger.info("Plugin startup report:\n" + "\n".join(lines))
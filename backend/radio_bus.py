@@ -0,0 +1,313 @@
+"""
+Radio Bus for DMR Libertas
+
+This module connects a single radio owner process to any number of API
+workers over a local Unix socket. The owner is the only process that opens
+the serial port; it publishes radio events to every worker and answers
+requests (transmit, job status, ...) on their behalf.
+
+The wire format is newline-delimited JSON. Owner to worker:
+    {"type": "event", "message": {...}, "topics": [...] | null}
+    {"type": "status", "epoch": "...", "version": N, "data": {...}}
+    {"type": "reply", "id": N, "result": ...} or {"type": "reply", "id": N, "error": {...}}
+Worker to owner:
+    {"id": N, "op": "transmit", "params": {...}}
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from uuid import uuid4
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Bus configuration
+DEFAULT_BUS_PATH = "/tmp/dmr-libertas.sock"
+MAX_LINE_SIZE = 4 * 1024 * 1024         # Largest message accepted on the bus
+MAX_SUBSCRIBER_BUFFER = 8 * 1024 * 1024  # Unsent bytes before a slow worker is dropped
+REQUEST_TIMEOUT = 65.0                  # seconds; covers long-poll style requests
+RECONNECT_DELAY = 1.0                   # seconds between worker reconnect attempts
+
+# Metrics
+BUS_EVENTS = registry.counter("dmr_bus_events_total", "Events published to or received from the radio bus")
+BUS_DROPPED = registry.counter("dmr_bus_dropped_subscribers_total", "Workers dropped for falling behind")
+
+
+class RadioBusError(Exception):
+    """Error returned by the radio owner for a bus request."""
+
+    def __init__(self, status_code: int, detail: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+class RadioBusServer:
+    """Owner side of the bus: publishes events and serves worker requests."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("RADIO_BUS_PATH", DEFAULT_BUS_PATH)
+        self.handlers: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self.snapshot: Optional[Callable[[], List[Dict[str, Any]]]] = None
+        # Identifies this owner run; state versions restart from 0 with a new epoch
+        self.epoch = uuid4().hex[:12]
+        self._subscribers: Set[asyncio.StreamWriter] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def register(self, op: str, handler: Callable[..., Awaitable[Any]]) -> None:
+        """Register an async handler for a worker request."""
+        self.handlers[op] = handler
+
+    async def start(self) -> None:
+        """Start listening on the Unix socket."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_worker, path=self.path, limit=MAX_LINE_SIZE)
+        logger.info(f"Radio bus listening on {self.path}")
+
+    async def stop(self) -> None:
+        """Stop the server and disconnect all workers."""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for writer in list(self._subscribers):
+            writer.close()
+        self._subscribers.clear()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def get_worker_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        """Send a message to every worker.
+
+        The message is serialized once; workers whose socket buffer is full
+        are dropped rather than allowed to stall the owner.
+        """
+        if not self._subscribers:
+            return
+        line = _encode(message)
+        BUS_EVENTS.inc()
+        for writer in list(self._subscribers):
+            if writer.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BUFFER:
+                logger.warning("Dropping radio bus worker that stopped reading")
+                BUS_DROPPED.inc()
+                self._subscribers.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+    async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one worker connection until it closes."""
+        self._subscribers.add(writer)
+        logger.info(f"Radio bus worker connected ({len(self._subscribers)} total)")
+        try:
+            if self.snapshot:
+                for message in self.snapshot():
+                    writer.write(_encode(message))
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    logger.warning("Ignoring malformed radio bus request")
+                    continue
+                asyncio.create_task(self._serve_request(writer, request))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            logger.warning(f"Radio bus worker connection error: {e}")
+        finally:
+            self._subscribers.discard(writer)
+            writer.close()
+            logger.info(f"Radio bus worker disconnected ({len(self._subscribers)} total)")
+
+    async def _serve_request(self, writer: asyncio.StreamWriter, request: Dict[str, Any]):
+        """Run a request handler and write its reply."""
+        reply: Dict[str, Any] = {"type": "reply", "id": request.get("id")}
+        handler = self.handlers.get(request.get("op"))
+        try:
+            if handler is None:
+                raise RadioBusError(404, f"Unknown bus operation: {request.get('op')}")
+            reply["result"] = await handler(**(request.get("params") or {}))
+        except Exception as e:
+            # HTTPException and RadioBusError both carry status_code/detail/headers
+            reply["error"] = {
+                "status_code": getattr(e, "status_code", 500),
+                "detail": getattr(e, "detail", str(e)),
+                "headers": getattr(e, "headers", None),
+            }
+        if not writer.is_closing():
+            writer.write(_encode(reply))
+
+
+class RemoteRadioState:
+    """Read-only mirror of the owner's radio status inside an API worker.
+
+    Exposes the same status attributes as DMRSerialHandler, so status
+    endpoints work unchanged against either. state_version is always the
+    owner's own version, so every worker reports the same version for the
+    same state; owner restarts and bus outages change state_epoch instead.
+    """
+
+    OFFLINE_EPOCH = "offline"
+
+    def __init__(self):
+        self.connected = False
+        self.radio_model = None
+        self.firmware_version = None
+        self.rssi = 0
+        self.battery_level = 0
+        self.gps_data = None
+        self.last_transmission = None
+        self.state_version = 0
+        self.owner_epoch: Optional[str] = None
+        self.owner_reachable = False
+        self._state_event = asyncio.Event()
+
+    @property
+    def state_epoch(self) -> str:
+        """The owner run state_version belongs to, or OFFLINE_EPOCH while the owner is unreachable."""
+        if not self.owner_reachable or self.owner_epoch is None:
+            return self.OFFLINE_EPOCH
+        return self.owner_epoch
+
+    def apply(self, version: int, data: Dict[str, Any], epoch: Optional[str] = None) -> None:
+        """Apply a status snapshot published by the owner."""
+        for key, value in data.items():
+            setattr(self, key, value)
+        self.owner_epoch = epoch
+        self.owner_reachable = True
+        self.state_version = version
+        self._notify()
+
+    def mark_disconnected(self) -> None:
+        """Report the radio as disconnected while the owner is unreachable."""
+        if self.owner_reachable or self.connected:
+            self.owner_reachable = False
+            self.connected = False
+            self._notify()
+
+    def _notify(self):
+        event, self._state_event = self._state_event, asyncio.Event()
+        event.set()
+
+    async def wait_for_state_version(self, version: int, timeout: Optional[float] = None) -> int:
+        """Wait until state_version reaches version, the epoch changes, or the timeout expires."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        epoch = self.state_epoch
+        while self.state_version < version and self.state_epoch == epoch:
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._state_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self.state_version
+
+
+class RadioBusClient:
+    """Worker side of the bus: receives events and sends requests to the owner."""
+
+    def __init__(self, on_event: Callable[[Dict[str, Any]], Awaitable[None]], path: str = None):
+        self.path = path or os.getenv("RADIO_BUS_PATH", DEFAULT_BUS_PATH)
+        self.on_event = on_event
+        self.state = RemoteRadioState()
+        self.connected = False
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start the connection loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Close the connection."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def request(self, op: str, timeout: float = REQUEST_TIMEOUT, **params) -> Any:
+        """Send a request to the owner and wait for its reply."""
+        if not self.connected or self._writer is None:
+            raise RadioBusError(503, "Radio owner not reachable")
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(_encode({"id": request_id, "op": op, "params": params}))
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise RadioBusError(504, f"Radio owner did not answer {op}")
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _run(self):
+        """Connect to the owner and dispatch messages, reconnecting on failure."""
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path, limit=MAX_LINE_SIZE)
+                self.connected = True
+                logger.info(f"Connected to radio bus at {self.path}")
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    await self._dispatch(json.loads(line))
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+                logger.warning(f"Radio bus connection error: {e}")
+            finally:
+                if self.connected:
+                    logger.warning("Lost connection to radio bus")
+                self.connected = False
+                self.state.mark_disconnected()
+                if self._writer:
+                    self._writer.close()
+                    self._writer = None
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(RadioBusError(503, "Radio owner connection lost"))
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _dispatch(self, message: Dict[str, Any]):
+        kind = message.get("type")
+        if kind == "reply":
+            future = self._pending.get(message.get("id"))
+            if future is None or future.done():
+                return
+            error = message.get("error")
+            if error:
+                future.set_exception(RadioBusError(error["status_code"], error["detail"], error.get("headers")))
+            else:
+                future.set_result(message.get("result"))
+        elif kind == "status":
+            self.state.apply(message["version"], message["data"], message.get("epoch"))
+        elif kind == "event":
+            BUS_EVENTS.inc()
+            try:
+                await self.on_event(message)
+            except Exception as e:
+                logger.error(f"Error handling radio bus event: {e}")
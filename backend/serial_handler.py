@@ -10,18 +10,26 @@ import logging
 import os
 import random
 import time
-from typing import Dict, Optional, Any, Union
+from typing import Awaitable, Callable, Dict, Optional, Any, Union
 
 import serial
 import serial_asyncio
 from serial.tools import list_ports
 
+from metrics import registry
+
 logger = logging.getLogger(__name__)
 
 # Constants
 DEFAULT_BAUDRATE = 460800
 SERIAL_TIMEOUT = 1.0
 READ_INTERVAL = 0.1  # seconds
+MAX_PENDING_FRAMES = 256  # parsed frames held for read_data() before the oldest are dropped
+
+# Reconnect supervision
+HOTPLUG_POLL_INTERVAL = 0.5  # seconds between port scans while the radio is absent
+RECONNECT_MIN_DELAY = 0.25   # seconds; first backoff step after a failed reopen
+RECONNECT_MAX_DELAY = 5.0    # seconds; backoff ceiling
 
 # Known radio vendor IDs
 RADIO_VENDOR_IDS = {
@@ -31,6 +39,19 @@ RADIO_VENDOR_IDS = {
     "10C4": "Silicon Labs"  # CP210x USB-Serial
 }
 
+# Metrics
+SERIAL_READS = registry.counter("dmr_serial_reads_total", "Reads that returned data from the serial port")
+PARSE_ERRORS = registry.counter("dmr_serial_parse_errors_total", "Frames that failed to parse")
+BYTES_READ = registry.counter("dmr_serial_bytes_read_total", "Bytes read from the serial port")
+BYTES_RATE = registry.rate("dmr_serial_bytes_per_second", "Serial read throughput in bytes per second")
+RECONNECTS = registry.counter("dmr_serial_reconnects_total", "Successful reconnects after a link loss")
+FRAMES_DROPPED = registry.counter("dmr_serial_frames_dropped_total", "Parsed frames dropped because no consumer kept up")
+LINK_LOSSES = registry.counter("dmr_serial_link_losses_total", "Times the serial link was lost")
+OUTAGE_SECONDS = registry.histogram(
+    "dmr_serial_outage_seconds", "Duration of serial link outages",
+    buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+)
+
 class DMRSerialHandler:
     """Handles serial communication with DMR radios."""
     
@@ -47,6 +68,18 @@ class DMRSerialHandler:
         self.writer = None
         self._read_task = None
         self._stop_event = asyncio.Event()
+        # The read loop is the only reader of the port; consumers take parsed frames from here
+        self.frames: asyncio.Queue = asyncio.Queue(MAX_PENDING_FRAMES)
+        
+        # Reconnect supervision
+        self.port_identity: Optional[Dict[str, Any]] = None
+        self.outage_started: Optional[float] = None
+        self.last_outage: Optional[Dict[str, float]] = None
+        self.on_link_change: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        self._supervisor_task = None
+        self._connected_event = asyncio.Event()
+        self._disconnected_event = asyncio.Event()
+        self._disconnected_event.set()
         
         # Radio state
         self.radio_model = None
@@ -56,6 +89,10 @@ class DMRSerialHandler:
         self.gps_data = None
         self.last_transmission = None
         
+        # Incremented whenever any status field changes
+        self.state_version = 0
+        self._state_event = asyncio.Event()
+        
         # Mock data
         self._mock_data = {
             "radio_model": "Anytone AT-D578UVIII Plus",
@@ -88,6 +125,9 @@ class DMRSerialHandler:
             self.connected = True
             self.radio_model = self._mock_data["radio_model"]
             self.firmware_version = self._mock_data["firmware"]
+            self._bump_state_version()
+            self._disconnected_event.clear()
+            self._connected_event.set()
             self._stop_event.clear()
             self._read_task = asyncio.create_task(self._mock_read_loop())
             return True
@@ -101,25 +141,7 @@ class DMRSerialHandler:
                 logger.error("No radio detected. Please connect a radio or use MOCK_MODE=true")
                 return False
                 
-            logger.info(f"Connecting to {self.port} at {self.baudrate} baud...")
-            
-            # Use asyncio serial library for non-blocking I/O
-            self.reader, self.writer = await serial_asyncio.open_serial_connection(
-                url=self.port,
-                baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=self.timeout
-            )
-            
-            self.connected = True
-            self._stop_event.clear()
-            self._read_task = asyncio.create_task(self._read_loop())
-            
-            # Initialize radio
-            await self._initialize_radio()
-            
+            await self._open_link(self.port)
             logger.info(f"Connected to {self.radio_model} (FW: {self.firmware_version})")
             return True
             
@@ -129,23 +151,72 @@ class DMRSerialHandler:
             return False
     
     async def disconnect(self):
-        """Close the serial connection."""
+        """Close the serial connection and stop reconnect supervision."""
+        await self.stop_supervisor()
         if not self.connected:
             return
             
         logger.info("Disconnecting from radio...")
+        await self._close_link()
+        logger.info("Disconnected from radio")
+    
+    @property
+    def reconnecting(self) -> bool:
+        """Whether the link dropped and the supervisor is bringing it back."""
+        return self.outage_started is not None and self._supervisor_task is not None
+    
+    async def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the radio is connected. Returns False on timeout."""
+        if self.connected:
+            return True
+        try:
+            await asyncio.wait_for(self._connected_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.connected
+    
+    async def _open_link(self, port: str):
+        """Open the serial port and initialize the radio."""
+        logger.info(f"Connecting to {port} at {self.baudrate} baud...")
+        
+        # Use asyncio serial library for non-blocking I/O
+        self.reader, self.writer = await serial_asyncio.open_serial_connection(
+            url=port,
+            baudrate=self.baudrate,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            timeout=self.timeout
+        )
         
+        self.connected = True
+        self._bump_state_version()
+        self._stop_event.clear()
+        self._read_task = asyncio.create_task(self._read_loop())
+        
+        # Initialize radio
+        await self._initialize_radio()
+        if not self.connected:
+            raise ConnectionError("Link dropped during radio initialization")
+        
+        # Remember the device so it can be found again if it re-enumerates
+        self.port_identity = self._port_identity(port) or self.port_identity
+        self._disconnected_event.clear()
+        self._connected_event.set()
+    
+    async def _close_link(self):
+        """Tear down the serial connection."""
         # Signal read loop to stop
         self._stop_event.set()
         
-        # Cancel read task
-        if self._read_task:
+        # Cancel read task (unless the read loop itself is closing the link)
+        if self._read_task and self._read_task is not asyncio.current_task():
             self._read_task.cancel()
             try:
                 await self._read_task
             except asyncio.CancelledError:
                 pass
-            self._read_task = None
+        self._read_task = None
         
         # Close serial connection
         if self.writer:
@@ -157,31 +228,166 @@ class DMRSerialHandler:
             
         self.reader = None
         self.writer = None
+        was_connected = self.connected
         self.connected = False
-        logger.info("Disconnected from radio")
+        self._connected_event.clear()
+        self._disconnected_event.set()
+        if was_connected:
+            self._bump_state_version()
     
-    async def read_data(self) -> Optional[Dict[str, Any]]:
-        """Read and parse data from the radio."""
+    async def _handle_link_loss(self, reason: str):
+        """Close a failed link and hand it to the supervisor to restore."""
         if not self.connected:
-            return None
+            return
+        # Stop other readers and writers from using the dying link right away
+        self.connected = False
+        self._bump_state_version()
+        logger.warning(f"Lost connection to radio: {reason}")
+        LINK_LOSSES.inc()
+        await self._close_link()
+        
+        if self.outage_started is None:
+            # Failed reconnect attempts extend the current outage rather than starting a new one
+            self.outage_started = time.time()
+            await self._notify_link_change({"state": "down", "since": self.outage_started, "reason": reason})
+    
+    async def _notify_link_change(self, event: Dict[str, Any]):
+        if self.on_link_change:
+            try:
+                await self.on_link_change(event)
+            except Exception as e:
+                logger.error(f"Error in link change callback: {e}")
+    
+    def start_supervisor(self) -> None:
+        """Start watching the link and reconnecting when it drops."""
+        if self.mock_mode or self._supervisor_task is not None:
+            return
+        self._supervisor_task = asyncio.create_task(self._supervise())
+    
+    async def stop_supervisor(self) -> None:
+        """Stop reconnect supervision."""
+        if self._supervisor_task:
+            self._supervisor_task.cancel()
+            try:
+                await self._supervisor_task
+            except asyncio.CancelledError:
+                pass
+            self._supervisor_task = None
+    
+    async def _supervise(self):
+        """Reopen the radio whenever it is disconnected.
+        
+        While the device is absent the port list is rescanned every
+        HOTPLUG_POLL_INTERVAL; once it is present, failed reopen attempts
+        back off exponentially with full jitter.
+        """
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            await self._disconnected_event.wait()
             
-        # In mock mode, return mock data
-        if self.mock_mode:
-            return self._generate_mock_data()
+            port = self._find_radio_port()
+            if port is None:
+                await asyncio.sleep(HOTPLUG_POLL_INTERVAL)
+                continue
+            
+            try:
+                await self._open_link(port)
+            except Exception as e:
+                logger.warning(f"Reconnect to {port} failed: {e}")
+                await self._close_link()
+                await asyncio.sleep(random.uniform(0, delay))
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            
+            delay = RECONNECT_MIN_DELAY
+            self.port = port
+            if self.outage_started is None:
+                # First connection after starting without a radio
+                logger.info(f"Radio detected; connected on {port}")
+                continue
+            
+            now = time.time()
+            self.last_outage = {"down_at": self.outage_started, "up_at": now,
+                                "duration": now - self.outage_started}
+            self.outage_started = None
+            RECONNECTS.inc()
+            OUTAGE_SECONDS.observe(self.last_outage["duration"])
+            logger.info(f"Reconnected to radio on {port} after {self.last_outage['duration']:.1f}s")
+            await self._notify_link_change({"state": "up", **self.last_outage})
+    
+    def _port_identity(self, device: str) -> Optional[Dict[str, Any]]:
+        """Get the USB identity (VID, PID, serial number) of a port."""
+        try:
+            for port in list_ports.comports():
+                if port.device == device and port.vid:
+                    return {"vid": port.vid, "pid": port.pid, "serial_number": port.serial_number}
+        except Exception as e:
+            logger.error(f"Error reading port identity: {e}")
+        return None
+    
+    def _find_radio_port(self) -> Optional[str]:
+        """Find the radio's current port, following it if it re-enumerates."""
+        try:
+            ports = list_ports.comports()
+        except Exception as e:
+            logger.error(f"Error scanning serial ports: {e}")
+            return None
+        
+        identity = self.port_identity
+        if identity:
+            for port in ports:
+                if (port.vid == identity["vid"] and port.pid == identity["pid"]
+                        and (not identity["serial_number"] or port.serial_number == identity["serial_number"])):
+                    return port.device
+            return None
+        
+        # Never connected yet: use the configured port or auto-detect
+        configured = os.getenv("SERIAL_PORT", "/dev/ttyUSB0")
+        if configured and configured != "auto":
+            return configured if any(port.device == configured for port in ports) or os.path.exists(configured) else None
+        return self._detect_radio_port()
+    
+    async def read_data(self) -> Dict[str, Any]:
+        """Wait for the next parsed frame from the radio.
+        
+        Only the read loop touches the serial port; this takes its output, so
+        any number of consumers can call it without competing for the reader.
+        """
+        return await self.frames.get()
+    
+    def _publish_frame(self, data: Dict[str, Any]) -> None:
+        """Queue a parsed frame for read_data(), dropping the oldest if nobody keeps up."""
+        if self.frames.full():
+            self.frames.get_nowait()
+            FRAMES_DROPPED.inc()
+        self.frames.put_nowait(data)
+    
+    async def _read_chunk(self) -> Optional[Dict[str, Any]]:
+        """Read and parse one chunk from the serial port. Only the read loop calls this."""
+        if self.reader is None:
+            return None
+        if self.reader.at_eof():
+            # The device went away (e.g. USB unplugged)
+            await self._handle_link_loss("end of stream")
+            return None
             
         # Real implementation would read from serial and parse DMR data
         # This is a simplified example
         try:
-            if self.reader and not self.reader.at_eof():
-                data = await self.reader.read(1024)
-                if data:
-                    # Parse DMR data here
-                    return self._parse_dmr_data(data)
-        except Exception as e:
+            data = await self.reader.read(1024)
+        except (OSError, serial.SerialException) as e:
             logger.error(f"Error reading from radio: {e}")
-            await self.disconnect()
+            await self._handle_link_loss(str(e))
+            return None
+        if not data:
+            await self._handle_link_loss("end of stream")
+            return None
             
-        return None
+        SERIAL_READS.inc()
+        BYTES_READ.inc(len(data))
+        BYTES_RATE.mark(len(data))
+        # Parse DMR data here
+        return self._parse_dmr_data(data)
     
     async def send_message(self, message: str) -> bool:
         """Send a message to the radio."""
@@ -199,19 +405,25 @@ class DMRSerialHandler:
                 return True
         except Exception as e:
             logger.error(f"Error sending message: {e}")
-            await self.disconnect()
+            await self._handle_link_loss(str(e))
             
         return False
     
     async def _read_loop(self):
-        """Background task to continuously read from the radio."""
-        while not self._stop_event.is_set():
+        """Background task to continuously read from the radio.
+        
+        Each link gets its own loop, which ends as soon as it is no longer
+        the current read task (its link was closed, maybe already replaced).
+        """
+        while self._read_task is asyncio.current_task() and not self._stop_event.is_set():
             try:
-                data = await self.read_data()
+                data = await self._read_chunk()
                 if data:
                     # Process incoming data
                     self._update_radio_state(data)
+                    self._publish_frame(data)
             except Exception as e:
+                # Not a link failure (those are handled in _read_chunk); keep the link up
                 logger.error(f"Error in read loop: {e}")
                 await asyncio.sleep(1)  # Prevent tight loop on errors
             
@@ -224,6 +436,7 @@ class DMRSerialHandler:
                 data = self._generate_mock_data()
                 if data:
                     self._update_radio_state(data)
+                    self._publish_frame(data)
             except Exception as e:
                 logger.error(f"Error in mock read loop: {e}")
                 
@@ -249,6 +462,7 @@ class DMRSerialHandler:
                 "talkgroup": random.choice([91, 310, 311, 312, 313, 314, 315, 316, 317, 318, 319, 2, 9, 90, 92, 93, 94, 95, 96, 97, 98, 99]),
                 "time": now,
                 "rssi": random.randint(50, 100),
+                "duration": round(random.uniform(1.0, 30.0), 1),
                 "location": random.choice(["San Francisco, CA", "New York, NY", "Chicago, IL", "Denver, CO", "Dallas, TX"])
             }
         
@@ -256,14 +470,45 @@ class DMRSerialHandler:
     
     def _update_radio_state(self, data: Dict[str, Any]):
         """Update internal radio state from received data."""
-        if "rssi" in data:
+        changed = False
+        if "rssi" in data and data["rssi"] != self.rssi:
             self.rssi = data["rssi"]
-        if "battery" in data:
+            changed = True
+        if "battery" in data and data["battery"] != self.battery_level:
             self.battery_level = data["battery"]
-        if "gps" in data:
-            self.gps_data = data["gps"]
-        if "last_heard" in data:
+            changed = True
+        if "gps" in data and data["gps"] != self.gps_data:
+            # Copy so later in-place edits by the producer register as changes
+            self.gps_data = dict(data["gps"]) if data["gps"] else data["gps"]
+            changed = True
+        if "last_heard" in data and data["last_heard"] != self.last_transmission:
             self.last_transmission = data["last_heard"]
+            changed = True
+        if changed:
+            self._bump_state_version()
+    
+    def _bump_state_version(self):
+        """Record a state change and wake anyone waiting for one."""
+        self.state_version += 1
+        event, self._state_event = self._state_event, asyncio.Event()
+        event.set()
+    
+    async def wait_for_state_version(self, version: int, timeout: Optional[float] = None) -> int:
+        """Wait until state_version reaches version, or the timeout expires.
+        
+        Returns the current state version either way.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while self.state_version < version:
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._state_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self.state_version
     
     def _parse_dmr_data(self, data: bytes) -> Dict[str, Any]:
         """Parse raw DMR data into a structured format."""
@@ -282,6 +527,7 @@ class DMRSerialHandler:
                 "battery": self.battery_level
             }
         except Exception as e:
+            PARSE_ERRORS.inc()
             logger.error(f"Error parsing DMR data: {e}")
             return {"error": str(e), "raw": data.hex()}
     
@@ -324,5 +570,5 @@ class DMRSerialHandler:
             
         except Exception as e:
             logger.error(f"Error initializing radio: {e}")
-            await self.disconnect()
+            await self._close_link()
             raise
\ No newline at end of file
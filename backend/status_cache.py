@@ -0,0 +1,57 @@
+"""
+Status Cache for DMR Libertas
+
+This module keeps the serialized radio status for the current state version,
+so repeated polls of /api/status reuse the same bytes and ETag instead of
+rebuilding the response model every time.
+"""
+import hashlib
+from typing import Callable, Optional, Tuple
+
+from metrics import registry
+
+# Metrics
+CACHE_HITS = registry.counter("dmr_status_cache_hits_total", "Status requests served from the cache")
+CACHE_MISSES = registry.counter("dmr_status_cache_misses_total", "Status requests that rebuilt the response")
+
+
+class StatusCache:
+    """Caches one pre-serialized status body per state version.
+
+    With get_epoch, the cache is keyed on (epoch, version) and the epoch is
+    part of the ETag, so the radio owner and every API worker hand out the
+    same ETag for the same state.
+    """
+
+    def __init__(self, get_version: Callable[[], int], render: Callable[[], bytes],
+                 get_epoch: Optional[Callable[[], Optional[str]]] = None):
+        self._get_version = get_version
+        self._get_epoch = get_epoch
+        self._render = render
+        self._key: Optional[Tuple[Optional[str], int]] = None
+        self._body = b""
+        self._etag = ""
+
+    def get(self) -> Tuple[int, bytes, str]:
+        """Get (version, body, etag) for the current state."""
+        epoch = self._get_epoch() if self._get_epoch else None
+        version = self._get_version()
+        if (epoch, version) == self._key:
+            CACHE_HITS.inc()
+            return version, self._body, self._etag
+
+        CACHE_MISSES.inc()
+        body = self._render()
+        # Hash the body as well so a restart that reuses a version number never
+        # produces a matching ETag for different content
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        tag = f"{epoch}-{version}-{digest}" if epoch else f"{version}-{digest}"
+        self._key, self._body, self._etag = (epoch, version), body, f'"{tag}"'
+        return version, self._body, self._etag
+
+    def matches(self, if_none_match: Optional[str], etag: str) -> bool:
+        """Check an If-None-Match header against an ETag."""
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,117 @@
+"""Tests for the Space-Saving summary and sliding-window activity analytics."""
+import random
+import time
+from collections import Counter
+
+from analytics import ActivityAnalytics, SlidingWindow, SpaceSaving
+
+
+def test_exact_below_capacity():
+    summary = SpaceSaving(capacity=4)
+    for key in ["a", "b", "a", "c", "a", "b"]:
+        summary.add(key)
+    assert summary.counts == {"a": 3, "b": 2, "c": 1}
+    assert set(summary.errors.values()) == {0.0}
+
+
+def test_newcomer_replaces_smallest_and_inherits_its_count():
+    summary = SpaceSaving(capacity=2)
+    summary.add("a", 5)
+    summary.add("b", 1)
+    summary.add("c", 2)
+    assert summary.counts == {"a": 5, "c": 3}
+    assert summary.errors["c"] == 1
+
+
+def test_heavy_hitters_present_with_bounded_error():
+    rng = random.Random(7)
+    stream = ["heavy1"] * 300 + ["heavy2"] * 200 + [f"id{rng.randrange(5000)}" for _ in range(2000)]
+    rng.shuffle(stream)
+    capacity = 20
+    summary = SpaceSaving(capacity)
+    for key in stream:
+        summary.add(key)
+
+    truth = Counter(stream)
+    assert len(summary.counts) == capacity
+    for key, count in truth.items():
+        if count > len(stream) / capacity:
+            assert key in summary.counts
+    for key, count in summary.counts.items():
+        assert count - summary.errors[key] <= truth[key] <= count
+
+
+def test_weighted_updates():
+    summary = SpaceSaving(capacity=2)
+    summary.add("tg1", 12.5)
+    summary.add("tg2", 3.0)
+    summary.add("tg1", 2.5)
+    summary.add("tg3", 1.0)
+    assert summary.counts == {"tg1": 15.0, "tg3": 4.0}
+
+
+def test_heap_stays_bounded_and_consistent():
+    summary = SpaceSaving(capacity=8)
+    for i in range(10000):
+        summary.add(i % 3 if i % 2 else ("caller", i))
+    assert len(summary._heap) <= 4 * summary.capacity + 1
+    assert len(summary.counts) == 8
+    assert sum(summary.counts.values()) == 10000
+
+
+def test_clear():
+    summary = SpaceSaving(capacity=2)
+    summary.add("a")
+    summary.clear()
+    summary.add("b")
+    assert summary.counts == {"b": 1}
+
+
+def test_sliding_window_counts_and_expires():
+    window = SlidingWindow(60, buckets=12)
+    for second in range(0, 60, 5):
+        window.record(1000 + second, 91, "W1ABC", 2.0)
+    snapshot = window.snapshot(1059)
+    assert snapshot["calls"] == 12
+    assert snapshot["airtime"] == 24.0
+    assert snapshot["top_talkgroups_by_calls"] == [{"id": 91, "value": 12}]
+    # Sub-buckets drop out five seconds at a time
+    assert window.snapshot(1064)["calls"] == 11
+    assert window.snapshot(1200)["calls"] == 0
+
+
+def test_sliding_window_ignores_calls_older_than_window():
+    window = SlidingWindow(60, buckets=12)
+    window.record(1100, 91, "A", 0.0)
+    window.record(1100 - 60, 92, "B", 0.0)
+    assert window.snapshot(1100)["calls"] == 1
+
+
+def test_sliding_window_ranks_by_airtime():
+    window = SlidingWindow(60)
+    window.record(10, 91, "A", 1.0)
+    window.record(11, 91, "A", 1.0)
+    window.record(12, 310, "B", 30.0)
+    snapshot = window.snapshot(12, limit=1)
+    assert snapshot["top_talkgroups_by_calls"] == [{"id": 91, "value": 2}]
+    assert snapshot["top_talkgroups_by_airtime"] == [{"id": 310, "value": 30.0}]
+
+
+def test_future_call_is_clamped_not_resetting_live_buckets():
+    analytics = ActivityAnalytics(windows={"1m": 60})
+    now = time.time()
+    for age in range(55, -1, -5):
+        analytics.record_call(91, "A", timestamp=now - age)
+    analytics.record_call(91, "B", timestamp=now + 30)
+    assert analytics.get_stats("1m")["1m"]["calls"] == 13
+
+
+def test_invalid_call_time_is_ignored():
+    analytics = ActivityAnalytics(windows={"1m": 60})
+    analytics.record_call(91, "A", timestamp="yesterday")
+    analytics.record_call(91, "A", timestamp=[1])
+    analytics.record_call(91, "A", airtime="long")
+    analytics.record_call(91, "A", timestamp=float("nan"))
+    assert analytics.get_stats("1m")["1m"]["calls"] == 0
+    analytics.record_call(91, "A", timestamp=str(time.time()), airtime="2.5")
+    assert analytics.get_stats("1m")["1m"]["airtime"] == 2.5
@@ -0,0 +1,132 @@
+"""Tests for the adaptive jitter buffer."""
+from jitter_buffer import FRAME_DURATION, JitterBuffer, JitterBufferManager
+
+
+def fixed_buffer(**options):
+    options.setdefault("target_delay", 0.060)
+    return JitterBuffer(adaptive=False, **options)
+
+
+def push_all(buffer, seqs, start=0.0, spacing=FRAME_DURATION):
+    for i, seq in enumerate(seqs):
+        buffer.push(seq, f"f{seq}".encode(), arrival=start + i * spacing)
+
+
+def drain(buffer, ticks):
+    frames = []
+    for _ in range(ticks):
+        frame = buffer.pop()
+        if frame is not None:
+            frames.append(frame)
+    return frames
+
+
+def test_prebuffers_to_target_then_plays_in_order():
+    buffer = fixed_buffer()
+    push_all(buffer, [1, 2])
+    assert buffer.pop() is None
+    push_all(buffer, [3])
+    assert drain(buffer, 3) == [(1, b"f1"), (2, b"f2"), (3, b"f3")]
+
+
+def test_reorders_frames():
+    buffer = fixed_buffer()
+    push_all(buffer, [12, 10, 11, 14, 13])
+    assert [seq for seq, _ in drain(buffer, 5)] == [10, 11, 12, 13, 14]
+    assert buffer.get_stats()["lost"] == 0
+
+
+def test_sequence_wrap():
+    buffer = fixed_buffer()
+    push_all(buffer, [65533, 65534, 65535, 0, 1, 2])
+    frames = drain(buffer, 6)
+    assert [seq for seq, _ in frames] == [65533, 65534, 65535, 0, 1, 2]
+    assert all(payload is not None for _, payload in frames)
+
+
+def test_startup_burst_is_not_trimmed():
+    buffer = JitterBuffer()
+    push_all(buffer, [65533, 65534, 65535, 0, 1, 2, 3, 4], spacing=0.001)
+    frames = drain(buffer, 8)
+    assert [seq for seq, _ in frames] == [65533, 65534, 65535, 0, 1, 2, 3, 4]
+    assert buffer.trimmed == 0
+
+
+def test_late_frame_is_dropped():
+    buffer = fixed_buffer()
+    push_all(buffer, [1, 2, 3])
+    drain(buffer, 2)
+    assert not buffer.push(1, b"late")
+    assert buffer.late == 1
+
+
+def test_duplicate_is_dropped():
+    buffer = fixed_buffer()
+    assert buffer.push(1, b"a")
+    assert not buffer.push(1, b"a")
+    assert buffer.duplicates == 1
+
+
+def test_missing_frame_yields_loss_marker():
+    buffer = fixed_buffer()
+    push_all(buffer, [1, 2, 4, 5])
+    assert drain(buffer, 5) == [(1, b"f1"), (2, b"f2"), (3, None), (4, b"f4"), (5, b"f5")]
+    stats = buffer.get_stats()
+    assert stats["lost"] == 1
+    assert stats["loss_ratio"] == 0.2
+
+
+def test_underrun_conceals_then_stops_when_sender_goes_quiet():
+    buffer = fixed_buffer(max_concealment=0.060)
+    push_all(buffer, [1, 2, 3])
+    frames = drain(buffer, 20)
+    assert frames[:3] == [(1, b"f1"), (2, b"f2"), (3, b"f3")]
+    # Three concealment ticks for the next frame, then silence
+    assert frames[3:] == [(4, None)] * 3
+    assert buffer.underruns == 3
+
+
+def test_resumes_at_next_talk_spurt_without_loss():
+    buffer = fixed_buffer(max_concealment=0.020)
+    push_all(buffer, [1, 2, 3])
+    drain(buffer, 10)
+    push_all(buffer, [40, 41, 42], start=1.0)
+    assert drain(buffer, 3) == [(40, b"f40"), (41, b"f41"), (42, b"f42")]
+    assert buffer.lost == 0
+    # Frames from before the pause are still late
+    assert not buffer.push(3, b"again")
+
+
+def test_trims_after_settling_and_counts_it_as_loss():
+    buffer = fixed_buffer(settle_time=0.040)
+    push_all(buffer, range(1, 11), spacing=0.001)
+    played = [seq for seq, payload in drain(buffer, 10) if payload is not None]
+    assert played[:2] == [1, 2]  # Nothing is trimmed while settling
+    assert buffer.trimmed > 0
+    assert len(played) + buffer.trimmed == 10
+    stats = buffer.get_stats()
+    assert stats["loss_ratio"] == round(buffer.trimmed / 10, 4)
+
+
+def test_adaptive_target_follows_jitter():
+    buffer = JitterBuffer()
+    steady = buffer.target_frames
+    for seq in range(1, 200):
+        # Alternate early and late arrivals by 30 ms
+        arrival = seq * FRAME_DURATION + (0.030 if seq % 2 else 0.0)
+        buffer.push(seq, b"x", arrival=arrival)
+        buffer.pop()
+    assert buffer.target_frames > steady
+    assert buffer.target_frames <= buffer.max_frames
+
+
+def test_manager_delivers_frames_to_sinks():
+    manager = JitterBufferManager(adaptive=False, target_delay=0.040, stream_timeout=0.0)
+    received = []
+    manager.add_sink(lambda stream_id, seq, payload: received.append((stream_id, seq, payload)))
+    manager.streams["call"] = JitterBuffer(adaptive=False, target_delay=0.040)
+    push_all(manager.streams["call"], [7, 8])
+    for _ in range(10):
+        manager._tick(now=1e9)
+    assert received[:2] == [("call", 7, b"f7"), ("call", 8, b"f8")]
+    assert "call" not in manager.streams
@@ -0,0 +1,71 @@
+"""Tests for the worker-side radio state mirror and status ETags."""
+import asyncio
+
+from radio_bus import RemoteRadioState
+from status_cache import StatusCache
+
+
+def make_cache(state):
+    return StatusCache(lambda: state.state_version,
+                       lambda: f"{state.connected}:{state.rssi}".encode(),
+                       lambda: state.state_epoch)
+
+
+def test_workers_mirror_the_owner_version_across_reconnects():
+    first, second = RemoteRadioState(), RemoteRadioState()
+    for version in (1, 2, 3):
+        first.apply(version, {"connected": True, "rssi": version}, epoch="run1")
+        second.apply(version, {"connected": True, "rssi": version}, epoch="run1")
+
+    # One worker loses the bus briefly and gets the owner's snapshot again
+    first.mark_disconnected()
+    assert first.state_version == 3 and not first.connected
+    first.apply(3, {"connected": True, "rssi": 3}, epoch="run1")
+
+    assert first.state_version == second.state_version == 3
+    assert make_cache(first).get() == make_cache(second).get()
+
+
+def test_disconnect_changes_etag_without_shifting_version():
+    state = RemoteRadioState()
+    state.apply(5, {"connected": True, "rssi": 1}, epoch="run1")
+    cache = make_cache(state)
+    version, _, online_etag = cache.get()
+    state.mark_disconnected()
+    offline_version, body, offline_etag = cache.get()
+    assert offline_version == version == 5
+    assert offline_etag != online_etag and offline_etag.startswith('"offline-5-')
+    assert body == b"False:1"
+
+
+def test_owner_restart_changes_etag_for_reused_version():
+    state = RemoteRadioState()
+    state.apply(2, {"connected": True, "rssi": 1}, epoch="run1")
+    cache = make_cache(state)
+    _, _, before = cache.get()
+    state.apply(2, {"connected": True, "rssi": 1}, epoch="run2")
+    assert cache.get()[2] != before
+
+
+def test_long_poll_returns_on_new_version_or_epoch_change():
+    async def run():
+        state = RemoteRadioState()
+        state.apply(4, {"connected": True}, epoch="run1")
+        loop = asyncio.get_running_loop()
+
+        waiter = asyncio.create_task(state.wait_for_state_version(5, timeout=5))
+        loop.call_later(0.01, state.apply, 5, {"rssi": 2}, "run1")
+        assert await waiter == 5
+
+        # An owner restart starts over at a lower version; waiters must not hang
+        waiter = asyncio.create_task(state.wait_for_state_version(6, timeout=5))
+        loop.call_later(0.01, state.apply, 1, {"rssi": 3}, "run2")
+        assert await asyncio.wait_for(waiter, 1) == 1
+
+        waiter = asyncio.create_task(state.wait_for_state_version(2, timeout=5))
+        loop.call_later(0.01, state.mark_disconnected)
+        assert await asyncio.wait_for(waiter, 1) == 1
+
+        assert await state.wait_for_state_version(5, timeout=0.01) == 1
+
+    asyncio.run(run())
@@ -0,0 +1,67 @@
+"""Tests for the serial handler's read loop and reconnect supervision."""
+import asyncio
+import logging
+
+import serial_handler
+from serial_handler import DMRSerialHandler
+
+
+class FakeWriter:
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+def read_loops():
+    return [task for task in asyncio.all_tasks()
+            if not task.done() and task.get_coro().__name__ == "_read_loop"]
+
+
+def test_reconnect_leaves_a_single_reader(monkeypatch, caplog):
+    readers = []
+
+    async def open_serial_connection(**kwargs):
+        reader = asyncio.StreamReader()
+        readers.append(reader)
+        return reader, FakeWriter()
+
+    monkeypatch.setattr(serial_handler.serial_asyncio, "open_serial_connection", open_serial_connection)
+    monkeypatch.setattr(DMRSerialHandler, "_find_radio_port", lambda self: "/dev/ttyFAKE")
+    monkeypatch.setattr(DMRSerialHandler, "_port_identity", lambda self, device: None)
+
+    async def run():
+        handler = DMRSerialHandler()
+        handler.mock_mode = False
+        events = []
+
+        async def on_link_change(event):
+            events.append(event["state"])
+
+        handler.on_link_change = on_link_change
+        await handler._open_link("/dev/ttyFAKE")
+        handler.start_supervisor()
+        assert len(read_loops()) == 1
+
+        readers[0].feed_eof()
+        await asyncio.wait_for(handler._connected_event.wait(), 1)
+        while events != ["down", "up"]:
+            await asyncio.sleep(0.01)
+        # Give the old loop time to wake from its sleep and notice it was replaced
+        await asyncio.sleep(serial_handler.READ_INTERVAL * 3)
+        loops = read_loops()
+        await handler.disconnect()
+        return len(readers), loops, events
+
+    with caplog.at_level(logging.ERROR, logger="serial_handler"):
+        opened, loops, events = asyncio.run(run())
+    assert opened == 2
+    assert len(loops) == 1
+    assert not [r for r in caplog.records if "already waiting" in r.getMessage()]
@@ -0,0 +1,110 @@
+"""Tests for GPS track storage and simplification."""
+import time
+from datetime import datetime, timezone
+
+from track_store import RadioTrack, TrackStore, bucket_by_time, douglas_peucker, parse_timestamp, simplify
+
+
+def make_track(timestamps, **options):
+    track = RadioTrack(**options)
+    for ts in timestamps:
+        track.append(ts, 50.0, 8.0, 100.0)
+    return track
+
+
+def test_track_grows_on_demand():
+    track = RadioTrack(max_capacity=100, initial_capacity=4)
+    assert track.capacity == 4
+    for ts in range(10):
+        track.append(ts, 50.0, 8.0, 0.0)
+    assert track.capacity == 16
+    assert [p[0] for p in track.points()] == list(range(10))
+
+
+def test_grow_preserves_order_after_wrap():
+    track = make_track(range(4), max_capacity=4, initial_capacity=4)
+    track.append(4, 50.0, 8.0, 0.0)  # Full at max capacity: overwrites the oldest
+    track.max_capacity = 8
+    track.append(5, 50.0, 8.0, 0.0)
+    assert [p[0] for p in track.points()] == [1, 2, 3, 4, 5]
+
+
+def test_ring_stops_at_max_capacity():
+    track = make_track(range(20), max_capacity=8, initial_capacity=2)
+    assert track.capacity == 8
+    assert [p[0] for p in track.points()] == list(range(12, 20))
+
+
+def test_time_range_is_inclusive_with_fractional_bounds():
+    track = make_track([100, 101, 102, 103])
+    assert track.count(101, 102) == 2
+    assert track.count(100.5, 102.5) == 2
+    assert [p[0] for p in track.points(100.5, 102.5)] == [101, 102]
+    assert track.count(103.5) == 0
+
+
+def test_store_drops_least_recent_radio():
+    store = TrackStore(max_radios=2)
+    store.add_fix("a", {"lat": 1, "lon": 1})
+    store.add_fix("b", {"lat": 1, "lon": 1})
+    store.add_fix("c", {"lat": 1, "lon": 1})
+    assert store.get_radio_ids() == ["b", "c"]
+
+
+def test_douglas_peucker_keeps_corners_within_budget():
+    # An L-shaped track: straight east, then straight north
+    points = [(i, 0.0, float(i), 0.0) for i in range(50)]
+    points += [(50 + i, float(i + 1), 49.0, 0.0) for i in range(50)]
+    simplified = douglas_peucker(points, 3)
+    assert simplified == [points[0], points[49], points[-1]]
+
+
+def test_douglas_peucker_keeps_largest_deviation_first():
+    points = [(i, 10.0 if i == 30 else 0.0, float(i), 0.0) for i in range(60)]
+    simplified = douglas_peucker(points, 3)
+    assert simplified[1] == points[30]
+
+
+def test_bucket_by_time_keeps_endpoints():
+    points = [(i, 0.0, float(i), 0.0) for i in range(1000)]
+    bucketed = bucket_by_time(points, 10)
+    assert len(bucketed) <= 10
+    assert bucketed[0] == points[0] and bucketed[-1] == points[-1]
+
+
+def test_simplify_short_tracks_unchanged():
+    points = [(i, 0.0, float(i), 0.0) for i in range(5)]
+    assert simplify(points, 10) == points
+    assert len(simplify(points * 100, 1)) == 2
+
+
+def test_parse_timestamp_formats():
+    assert parse_timestamp(1700000000) == 1700000000
+    assert parse_timestamp(1700000000500) == 1700000000.5
+    assert parse_timestamp("1700000000") == 1700000000
+    assert parse_timestamp("2023-11-14T22:13:20Z") == 1700000000
+    assert parse_timestamp("2023-11-14T22:13:20") == 1700000000
+    for bad in ["yesterday", float("nan"), float("inf"), -5, 2 ** 40 * 1000, True, None, [1]]:
+        assert parse_timestamp(bad) is None
+
+
+def test_malformed_fix_is_rejected_without_evicting():
+    store = TrackStore(max_radios=1)
+    now = time.time()
+    assert store.add_fix("a", {"lat": 1, "lon": 2, "timestamp": now})
+    for gps in [{"lat": 1, "lon": 2, "timestamp": "yesterday"},
+                {"lat": 1, "lon": 2, "timestamp": float("inf")},
+                {"lat": float("nan"), "lon": 2},
+                {"lat": 91, "lon": 2}]:
+        assert not store.add_fix("b", gps)
+    assert store.get_radio_ids() == ["a"]
+
+
+def test_fix_formats_are_converted():
+    store = TrackStore()
+    now = int(time.time())
+    assert store.add_fix("ms", {"lat": 1, "lon": 2, "timestamp": now * 1000, "alt": "10m"})
+    iso = datetime.fromtimestamp(now, timezone.utc).isoformat()
+    assert store.add_fix("iso", {"lat": 1, "lon": 2, "timestamp": iso, "alt": "12.5"})
+    tracks = {track["radio_id"]: track["points"] for track in store.query()}
+    assert tracks == {"ms": [[now, 1.0, 2.0, 0.0]], "iso": [[now, 1.0, 2.0, 12.5]]}
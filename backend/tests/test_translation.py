@@ -0,0 +1,140 @@
+"""Tests for cached, batched translation with the stub backend."""
+import asyncio
+import json
+
+import pytest
+
+from translation import StubBackend, TranslationBackend, TranslationCache, TranslationService, normalize_text
+
+
+class CountingBackend(StubBackend):
+    def __init__(self):
+        self.batches = []
+
+    async def translate_batch(self, texts, source, target):
+        self.batches.append((list(texts), source, target))
+        return await super().translate_batch(texts, source, target)
+
+
+def test_normalize_text():
+    assert normalize_text("  Copy  that,  OVER! ") == "copy that over"
+    assert normalize_text("...") == ""
+
+
+def test_backend_must_implement_translate_batch():
+    with pytest.raises(TypeError):
+        TranslationBackend()
+
+
+def test_identical_segments_are_coalesced_and_batched():
+    async def run():
+        backend = CountingBackend()
+        service = TranslationService(backend, batch_window=0.01)
+        results = await asyncio.gather(
+            service.translate("Copy that", "en", "de"),
+            service.translate("copy that!", "en", "de"),
+            service.translate("Roger", "en", "de"),
+        )
+        return backend, service, results
+
+    backend, service, results = asyncio.run(run())
+    assert backend.batches == [(["Copy that", "Roger"], "de", "en")]
+    assert [text for text, _ in results] == ["[en] Copy that", "[en] Copy that", "[en] Roger"]
+    assert all(not cached for _, cached in results)
+    assert len(service.cache) == 2
+
+
+def test_repeated_phrase_served_from_cache():
+    async def run():
+        backend = CountingBackend()
+        service = TranslationService(backend, batch_window=0)
+        await service.translate("Net check-in", "en", "de")
+        return backend, await service.translate("net check in", "en", "de")
+
+    backend, (text, cached) = asyncio.run(run())
+    assert cached and text == "[en] Net check-in"
+    assert len(backend.batches) == 1
+
+
+def test_cache_separates_source_languages():
+    async def run():
+        backend = CountingBackend()
+        service = TranslationService(backend, batch_window=0)
+        await service.translate("gift", "en", "de")
+        await service.translate("gift", "en", "sv")
+        return backend
+
+    backend = asyncio.run(run())
+    assert [(source, target) for _, source, target in backend.batches] == [("de", "en"), ("sv", "en")]
+
+
+def test_same_language_is_not_translated():
+    service = TranslationService(CountingBackend())
+    assert asyncio.run(service.translate("Hallo", "de", "de")) == ("Hallo", True)
+
+
+def test_cache_persists_across_restarts(tmp_path):
+    path = str(tmp_path / "cache.json")
+
+    async def first_run():
+        service = TranslationService(StubBackend(), TranslationCache(path=path), batch_window=0)
+        await service.start()
+        await service.translate("Mayday", "en", "fr")
+        await service.stop()
+
+    async def second_run():
+        backend = CountingBackend()
+        service = TranslationService(backend, TranslationCache(path=path))
+        await service.start()
+        result = await service.translate("mayday", "en", "fr")
+        await service.stop()
+        return backend, result
+
+    asyncio.run(first_run())
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"version": 2, "entries": [["fr", "en", "mayday", "[en] Mayday"]]}
+    backend, result = asyncio.run(second_run())
+    assert result == ("[en] Mayday", True)
+    assert backend.batches == []
+
+
+def test_old_cache_version_is_ignored(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({"version": 1, "entries": [["en", "mayday", "Mayday"]]}))
+    cache = TranslationCache(path=str(path))
+    cache.load()
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TranslationCache(capacity=2)
+    cache.put("de", "en", "a", "A")
+    cache.put("de", "en", "b", "B")
+    cache.get("de", "en", "a")
+    cache.put("de", "en", "c", "C")
+    assert cache.get("de", "en", "b") is None
+    assert cache.get("de", "en", "a") == "A"
+
+
+def test_short_backend_result_fails_the_whole_batch():
+    class ShortBackend(CountingBackend):
+        async def translate_batch(self, texts, source, target):
+            results = await super().translate_batch(texts, source, target)
+            return results[:-1] if len(self.batches) == 1 else results
+
+    async def run():
+        backend = ShortBackend()
+        service = TranslationService(backend, batch_window=0.01)
+        first = await asyncio.gather(
+            service.translate("Copy", "en", "de"),
+            service.translate("Roger", "en", "de"),
+            return_exceptions=True,
+        )
+        inflight = dict(service._inflight)
+        retry = await asyncio.wait_for(service.translate("Roger", "en", "de"), 1)
+        return first, inflight, retry
+
+    first, inflight, retry = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in first)
+    assert inflight == {}
+    assert retry == ("[en] Roger", False)
@@ -0,0 +1,97 @@
+"""Tests for the transmit scheduler's rate limiting and queue limits."""
+import asyncio
+
+import pytest
+
+import tx_scheduler
+from tx_scheduler import Priority, TokenBucket, TxRejected, TxScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(tx_scheduler.time, "monotonic", fake)
+    return fake
+
+
+def test_token_bucket_drains_and_refills(clock):
+    bucket = TokenBucket(capacity=3, refill_rate=1.0, updated=clock.now)
+    assert [bucket.consume() for _ in range(4)] == [True, True, True, False]
+    assert bucket.retry_after() == pytest.approx(1.0)
+
+    clock.now += 1.5
+    assert bucket.consume()
+    assert not bucket.consume()
+
+
+def test_token_bucket_never_exceeds_capacity(clock):
+    bucket = TokenBucket(capacity=2, refill_rate=10.0, updated=clock.now)
+    clock.now += 60
+    assert [bucket.consume() for _ in range(3)] == [True, True, False]
+
+
+def test_rate_limit_is_per_user():
+    scheduler = TxScheduler(serial_handler=None, sms_per_minute=2)
+    scheduler.submit("one", user="10.0.0.1")
+    scheduler.submit("two", user="10.0.0.1")
+    with pytest.raises(TxRejected) as rejected:
+        scheduler.submit("three", user="10.0.0.1")
+    assert rejected.value.retry_after == pytest.approx(30.0, abs=0.1)
+
+    scheduler.submit("other", user="10.0.0.2")
+
+
+def test_queue_limit():
+    scheduler = TxScheduler(serial_handler=None, max_queue_size=2)
+    scheduler.submit("a", user="u1")
+    scheduler.submit("b", user="u2")
+    with pytest.raises(TxRejected):
+        scheduler.submit("c", user="u3")
+
+
+def test_emergency_bypasses_limits_but_has_its_own_cap():
+    scheduler = TxScheduler(serial_handler=None, sms_per_minute=1, max_queue_size=1, max_emergency_queued=2)
+    scheduler.submit("normal", user="u1")
+    scheduler.submit("mayday 1", user="u1", priority=Priority.EMERGENCY)
+    scheduler.submit("mayday 2", user="u1", priority=Priority.EMERGENCY)
+    with pytest.raises(TxRejected):
+        scheduler.submit("mayday 3", user="u1", priority=Priority.EMERGENCY)
+
+
+def test_emergency_jobs_are_sent_first():
+    class Radio:
+        connected = True
+
+        def __init__(self):
+            self.sent = []
+
+        async def wait_connected(self, timeout=None):
+            return True
+
+        async def send_message(self, message):
+            self.sent.append(message)
+            return True
+
+    async def run():
+        radio = Radio()
+        scheduler = TxScheduler(radio, frame_interval=0)
+        scheduler.submit("low", user="u1", priority=Priority.LOW)
+        scheduler.submit("normal", user="u2")
+        last = scheduler.submit("mayday", user="u3", priority=Priority.EMERGENCY)
+        await scheduler.start()
+        await scheduler.wait(last.job_id, timeout=1)
+        await asyncio.sleep(0.01)
+        await scheduler.stop()
+        return radio.sent, scheduler._emergency_queued
+
+    sent, emergency_queued = asyncio.run(run())
+    assert sent == ["mayday", "normal", "low"]
+    assert emergency_queued == 0
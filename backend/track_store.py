@@ -0,0 +1,350 @@
+"""
+GPS Track Store for DMR Libertas
+
+This module keeps a bounded GPS track per radio and answers map queries
+with tracks simplified to a point budget.
+
+Each track is a ring of compact columns (uint32 timestamps, float32
+latitude/longitude/altitude) that grows with the radio's fix rate up to a
+fixed cap, so a radio that reports rarely costs a few hundred bytes. Points
+older than the retention window are dropped as new fixes arrive.
+"""
+import heapq
+import logging
+import math
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Track configuration
+TRACK_RETENTION = 24 * 3600     # seconds of history kept per radio
+MAX_POINTS_PER_RADIO = 17280    # 24 h at one fix every 5 s
+INITIAL_POINTS = 64             # ring slots allocated for a new radio; doubled as needed
+MIN_FIX_INTERVAL = 1.0          # seconds; faster fixes from one radio are ignored
+MAX_RADIOS = 256                # least recently updated radios are dropped beyond this
+DEFAULT_POINT_BUDGET = 2000     # points returned per query across all tracks
+PRESIMPLIFY_FACTOR = 4          # time-bucket down to this multiple of the budget before Douglas-Peucker
+MAX_TIMESTAMP = 2 ** 32 - 1     # timestamps are stored as uint32 seconds
+MILLISECONDS_THRESHOLD = 1e11   # larger numeric timestamps are taken to be in milliseconds
+
+# Metrics
+TRACK_POINTS = registry.counter("dmr_track_points_total", "GPS fixes stored in the track store")
+
+Point = Tuple[int, float, float, float]
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Convert a fix timestamp (epoch seconds or milliseconds, or ISO 8601) to epoch seconds.
+
+    Returns None if it cannot be parsed or does not fit the uint32 column.
+    """
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            try:
+                parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+            except ValueError:
+                return None
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            value = parsed.timestamp()
+    elif isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    value = float(value)
+    if value > MILLISECONDS_THRESHOLD:
+        value /= 1000.0
+    if not math.isfinite(value) or not 0 <= value <= MAX_TIMESTAMP:
+        return None
+    return value
+
+
+class RadioTrack:
+    """Ring buffer of GPS fixes for one radio, grown on demand up to max_capacity."""
+
+    __slots__ = ("capacity", "max_capacity", "timestamps", "lats", "lons", "alts", "head", "size")
+
+    def __init__(self, max_capacity: int = MAX_POINTS_PER_RADIO, initial_capacity: int = INITIAL_POINTS):
+        self.max_capacity = max_capacity
+        self.capacity = max(1, min(initial_capacity, max_capacity))
+        self.timestamps = array("I", bytes(4 * self.capacity))
+        self.lats = array("f", bytes(4 * self.capacity))
+        self.lons = array("f", bytes(4 * self.capacity))
+        self.alts = array("f", bytes(4 * self.capacity))
+        self.head = 0  # index of the oldest point
+        self.size = 0
+
+    def _grow(self) -> None:
+        """Double the full ring (up to max_capacity), unrolling it so the oldest point is first."""
+        capacity = min(self.capacity * 2, self.max_capacity)
+        padding = bytes(4 * (capacity - self.capacity))
+        for name in ("timestamps", "lats", "lons", "alts"):
+            column = getattr(self, name)
+            grown = column[self.head:] + column[:self.head]
+            grown.frombytes(padding)
+            setattr(self, name, grown)
+        self.head = 0
+        self.capacity = capacity
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        if not self.size:
+            return None
+        return self.timestamps[(self.head + self.size - 1) % self.capacity]
+
+    def append(self, timestamp: float, lat: float, lon: float, alt: float) -> None:
+        """Add a fix, overwriting the oldest one when full."""
+        if self.size == self.capacity < self.max_capacity:
+            self._grow()
+        if self.size < self.capacity:
+            index = (self.head + self.size) % self.capacity
+            self.size += 1
+        else:
+            index = self.head
+            self.head = (self.head + 1) % self.capacity
+        self.timestamps[index] = int(timestamp)
+        self.lats[index] = lat
+        self.lons[index] = lon
+        self.alts[index] = alt
+
+    def expire(self, cutoff: float) -> None:
+        """Drop points older than cutoff."""
+        while self.size and self.timestamps[self.head] < cutoff:
+            self.head = (self.head + 1) % self.capacity
+            self.size -= 1
+
+    def _first_offset_at_or_after(self, timestamp: float) -> int:
+        """Binary search the (time-ordered) ring for the first point at or after timestamp."""
+        low, high = 0, self.size
+        while low < high:
+            mid = (low + high) // 2
+            if self.timestamps[(self.head + mid) % self.capacity] < timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def _first_offset_after(self, timestamp: float) -> int:
+        """Binary search the (time-ordered) ring for the first point strictly after timestamp."""
+        low, high = 0, self.size
+        while low < high:
+            mid = (low + high) // 2
+            if self.timestamps[(self.head + mid) % self.capacity] <= timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def count(self, since: float = 0, until: float = float("inf")) -> int:
+        """Count points in a time range (both ends inclusive)."""
+        return max(0, self._first_offset_after(until) - self._first_offset_at_or_after(since))
+
+    def points(self, since: float = 0, until: float = float("inf"),
+               bbox: Optional[Sequence[float]] = None, limit: Optional[int] = None) -> List[Point]:
+        """Get points in time order, filtered by time range (both ends inclusive) and bounding box.
+
+        With limit and no bbox, points are taken at an even stride so at most
+        about limit points are materialized; the last point is always included.
+        """
+        start = self._first_offset_at_or_after(since)
+        end = self._first_offset_after(until)
+        step = 1
+        if limit and not bbox and end - start > limit:
+            step = (end - start) // limit + 1
+
+        result = []
+        capacity, head = self.capacity, self.head
+        timestamps, lats, lons, alts = self.timestamps, self.lats, self.lons, self.alts
+        if bbox:
+            min_lon, min_lat, max_lon, max_lat = bbox
+        offsets = range(start, end, step)
+        for offset in offsets:
+            i = (head + offset) % capacity
+            lat, lon = lats[i], lons[i]
+            if bbox and not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+                continue
+            result.append((timestamps[i], lat, lon, alts[i]))
+        if step > 1 and offsets and offsets[-1] != end - 1:
+            i = (head + end - 1) % capacity
+            result.append((timestamps[i], lats[i], lons[i], alts[i]))
+        return result
+
+
+def bucket_by_time(points: List[Point], budget: int) -> List[Point]:
+    """Downsample to at most budget points by keeping one point per time bucket.
+
+    The first and last points are always kept, so budget must be at least 2.
+    """
+    if len(points) <= budget:
+        return points
+    start, end = points[0][0], points[-1][0]
+    span = max(end - start, 1)
+    buckets = budget - 2
+    result = [points[0]]
+    last_bucket = -1
+    for point in points[1:-1] if buckets else ():
+        bucket = min(int((point[0] - start) * buckets / span), buckets - 1)
+        if bucket != last_bucket:
+            result.append(point)
+            last_bucket = bucket
+    result.append(points[-1])
+    return result
+
+
+def _segment_error(points: List[Point], first: int, last: int) -> Tuple[float, int]:
+    """Find the point between first and last farthest from the chord joining them."""
+    _, y1, x1, _ = points[first]
+    _, y2, x2, _ = points[last]
+    dx, dy = x2 - x1, y2 - y1
+    norm = dx * dx + dy * dy
+    best, best_index = -1.0, first
+    for i in range(first + 1, last):
+        _, y, x, _ = points[i]
+        if norm == 0:
+            dist = (x - x1) ** 2 + (y - y1) ** 2
+        else:
+            # Squared perpendicular distance; relative order is all that matters
+            cross = dx * (y1 - y) - dy * (x1 - x)
+            dist = cross * cross / norm
+        if dist > best:
+            best, best_index = dist, i
+    return best, best_index
+
+
+def douglas_peucker(points: List[Point], budget: int) -> List[Point]:
+    """Simplify a track to at most budget points with top-down Douglas-Peucker.
+
+    Instead of a distance tolerance, the segment with the largest error is
+    split until the point budget (at least 2) is used up.
+    """
+    if len(points) <= budget:
+        return points
+
+    keep = {0, len(points) - 1}
+    heap = []
+    error, index = _segment_error(points, 0, len(points) - 1)
+    if index != 0:
+        heapq.heappush(heap, (-error, 0, len(points) - 1, index))
+    while heap and len(keep) < budget:
+        _, first, last, index = heapq.heappop(heap)
+        keep.add(index)
+        for a, b in ((first, index), (index, last)):
+            if b - a > 1:
+                error, split = _segment_error(points, a, b)
+                heapq.heappush(heap, (-error, a, b, split))
+    return [points[i] for i in sorted(keep)]
+
+
+def simplify(points: List[Point], budget: int, method: str = "dp") -> List[Point]:
+    """Simplify a track to a point budget with "dp" or "bucket"."""
+    budget = max(budget, 2)
+    if len(points) <= budget:
+        return points
+    if method == "bucket":
+        return bucket_by_time(points, budget)
+    # Bucket first so Douglas-Peucker only sees a few times the budget
+    return douglas_peucker(bucket_by_time(points, budget * PRESIMPLIFY_FACTOR), budget)
+
+
+class TrackStore:
+    """Per-radio GPS tracks with time-based retention."""
+
+    def __init__(self, retention: float = TRACK_RETENTION, capacity: int = MAX_POINTS_PER_RADIO,
+                 max_radios: int = MAX_RADIOS):
+        self.retention = retention
+        self.capacity = capacity
+        self.max_radios = max_radios
+        self._tracks: "OrderedDict[str, RadioTrack]" = OrderedDict()
+
+    def add_fix(self, radio_id: str, gps: Dict[str, Any]) -> bool:
+        """Record a GPS fix. Returns False if it was ignored as invalid or too frequent."""
+        try:
+            lat = float(gps["lat"])
+            lon = float(gps["lon"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):  # Also rejects NaN
+            return False
+        if gps.get("timestamp"):
+            timestamp = parse_timestamp(gps["timestamp"])
+            if timestamp is None:
+                return False
+        else:
+            timestamp = time.time()
+        try:
+            alt = float(gps.get("alt") or 0.0)
+        except (TypeError, ValueError):
+            alt = 0.0  # Altitude is optional; keep the position
+        if not math.isfinite(alt):
+            alt = 0.0
+
+        track = self._tracks.get(radio_id)
+        if track is not None:
+            last = track.last_timestamp
+            if last is not None and timestamp - last < MIN_FIX_INTERVAL:
+                return False
+            track.append(timestamp, lat, lon, alt)
+            self._tracks.move_to_end(radio_id)
+        else:
+            track = RadioTrack(self.capacity)
+            track.append(timestamp, lat, lon, alt)
+            # Only a fix that was stored may push another radio out
+            if len(self._tracks) >= self.max_radios:
+                self._tracks.popitem(last=False)
+            self._tracks[radio_id] = track
+
+        track.expire(time.time() - self.retention)
+        TRACK_POINTS.inc()
+        return True
+
+    def get_radio_ids(self) -> List[str]:
+        return list(self._tracks.keys())
+
+    def query(self, radio_ids: Optional[Sequence[str]] = None, since: Optional[float] = None,
+              until: Optional[float] = None, bbox: Optional[Sequence[float]] = None,
+              max_points: int = DEFAULT_POINT_BUDGET, method: str = "dp") -> List[Dict[str, Any]]:
+        """Get tracks simplified so that all of them together fit in max_points.
+
+        The budget is shared between radios in proportion to how many points
+        each one has in the requested window.
+        """
+        cutoff = time.time() - self.retention
+        since = max(since or 0, cutoff)
+        until = until if until is not None else float("inf")
+
+        selected = []
+        for radio_id in (radio_ids or list(self._tracks.keys())):
+            track = self._tracks.get(radio_id)
+            if track is None:
+                continue
+            track.expire(cutoff)
+            if bbox:
+                # The budget is shared by points inside the box, so filter up front
+                points = track.points(since, until, bbox)
+                count = len(points)
+            else:
+                points = None
+                count = track.count(since, until)
+            if count:
+                selected.append((radio_id, track, count, points))
+
+        total = sum(count for _, _, count, _ in selected)
+        tracks = []
+        for radio_id, track, count, points in selected:
+            budget = max(2, max_points * count // total) if total > max_points else count
+            if points is None:
+                # Only materialize a few times the budget; the simplifier does the rest
+                points = track.points(since, until, limit=budget * PRESIMPLIFY_FACTOR)
+            simplified = simplify(points, budget, method)
+            tracks.append({
+                "radio_id": radio_id,
+                "total_points": count,
+                "points": [[ts, round(lat, 6), round(lon, 6), round(alt, 1)] for ts, lat, lon, alt in simplified],
+            })
+        return tracks
@@ -0,0 +1,345 @@
+"""
+Translation Service for DMR Libertas
+
+This module translates transcript segments into the configured target
+languages and publishes the results on the "transcript" WebSocket topic next
+to the transcripts themselves.
+
+Radio traffic repeats itself (callsigns, "copy", net check-ins), so every
+translation is cached under its language pair and normalized text in a
+persistent LRU cache, and only new phrases reach the model. Those are queued
+per language pair and sent in batches, with identical in-flight phrases
+coalesced.
+"""
+import abc
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+import urllib.request
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import registry
+from plugins import Plugin, PluginContext
+
+logger = logging.getLogger(__name__)
+
+# Service configuration
+CACHE_SIZE = 10000          # cached translations across all languages
+CACHE_SAVE_INTERVAL = 60.0  # seconds between saves of a changed cache
+BATCH_SIZE = 16             # segments per backend request
+BATCH_WINDOW = 0.05         # seconds to wait for more segments before sending a batch
+REQUEST_TIMEOUT = 10.0      # seconds for one HTTP backend request
+
+# Metrics
+CACHE_HITS = registry.counter("dmr_translation_cache_hits_total", "Translations served from the cache")
+CACHE_MISSES = registry.counter("dmr_translation_cache_misses_total", "Translations that needed the backend")
+CACHE_HIT_RATIO = registry.gauge(
+    "dmr_translation_cache_hit_ratio", "Fraction of translations served from the cache",
+    func=lambda: CACHE_HITS.value / (CACHE_HITS.value + CACHE_MISSES.value)
+    if CACHE_HITS.value + CACHE_MISSES.value else 0.0
+)
+BACKEND_LATENCY = registry.histogram("dmr_translation_backend_seconds", "Time for one batched backend request")
+TRANSLATION_LATENCY = registry.histogram("dmr_translation_latency_seconds", "Time to translate one segment, cached or not")
+BACKEND_SEGMENTS = registry.counter(
+    "dmr_translation_backend_segments_total", "Segments sent to the backend after caching and coalescing"
+)
+BACKEND_ERRORS = registry.counter("dmr_translation_errors_total", "Failed backend translation requests")
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Reduce a segment to its cache key: case, punctuation and spacing removed."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", text)).strip()
+
+
+class TranslationCache:
+    """LRU cache of translations keyed by (source, target, normalized text), saved as JSON.
+
+    A source of None means the backend detected the language itself.
+    """
+
+    VERSION = 2  # Version 1 entries had no source language and are not loaded
+
+    def __init__(self, capacity: int = CACHE_SIZE, path: Optional[str] = None):
+        self.capacity = capacity
+        self.path = path
+        self._entries: "OrderedDict[Tuple[Optional[str], str, str], str]" = OrderedDict()
+        self._writing: Optional[asyncio.Future] = None
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, source: Optional[str], target: str, key: str) -> Optional[str]:
+        value = self._entries.get((source, target, key))
+        if value is not None:
+            self._entries.move_to_end((source, target, key))
+        return value
+
+    def put(self, source: Optional[str], target: str, key: str, value: str) -> None:
+        self._entries[(source, target, key)] = value
+        self._entries.move_to_end((source, target, key))
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        self.dirty = True
+
+    def load(self) -> None:
+        """Load a saved cache, oldest entries first. Blocking; run it in an executor."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("version") != self.VERSION:
+                logger.info(f"Ignoring translation cache {self.path} from an older version")
+                return
+            for source, target, key, value in saved["entries"][-self.capacity:]:
+                self._entries[(source, target, key)] = value
+            logger.info(f"Loaded {len(self._entries)} cached translations from {self.path}")
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable translation cache {self.path}: {e}")
+
+    async def save(self) -> None:
+        """Write the cache atomically, in LRU order, without blocking the event loop."""
+        if not self.path or not self.dirty:
+            return
+        if self._writing is not None:
+            # Writes share the temp file, so let an earlier one finish first
+            await asyncio.wait([self._writing])
+        entries = [[source, target, key, value] for (source, target, key), value in self._entries.items()]
+        self.dirty = False
+        self._writing = asyncio.get_running_loop().run_in_executor(None, self._write, entries)
+        # Shielded so a cancelled caller never abandons a half-written file
+        if not await asyncio.shield(self._writing):
+            self.dirty = True
+
+    def _write(self, entries: List[List[Optional[str]]]) -> bool:
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "entries": entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            return True
+        except OSError as e:
+            logger.error(f"Error saving translation cache: {e}")
+            return False
+
+
+class TranslationBackend(abc.ABC):
+    """Base class for translation backends."""
+    name = "backend"
+
+    @abc.abstractmethod
+    async def translate_batch(self, texts: List[str], source: Optional[str], target: str) -> List[str]:
+        """Translate texts into target, returning one result per input."""
+
+
+class StubBackend(TranslationBackend):
+    """Offline backend that tags text with the target language, for development and tests."""
+    name = "stub"
+
+    async def translate_batch(self, texts: List[str], source: Optional[str], target: str) -> List[str]:
+        return [f"[{target}] {text}" for text in texts]
+
+
+class LibreTranslateBackend(TranslationBackend):
+    """Backend for a LibreTranslate-compatible server, which accepts a list of texts per request."""
+    name = "libretranslate"
+
+    def __init__(self, url: str, api_key: Optional[str] = None):
+        self.url = url
+        self.api_key = api_key
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        request = urllib.request.Request(
+            self.url, data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return json.load(response)
+
+    async def translate_batch(self, texts: List[str], source: Optional[str], target: str) -> List[str]:
+        payload = {"q": texts, "source": source or "auto", "target": target, "format": "text"}
+        if self.api_key:
+            payload["api_key"] = self.api_key
+        result = await asyncio.get_running_loop().run_in_executor(None, self._post, payload)
+        translated = result["translatedText"]
+        if len(translated) != len(texts):
+            raise ValueError(f"Expected {len(texts)} translations, got {len(translated)}")
+        return translated
+
+
+def backend_from_config(config: Dict[str, str]) -> TranslationBackend:
+    """Create the backend named by TRANSLATION_BACKEND."""
+    name = config.get("TRANSLATION_BACKEND", "stub").lower()
+    if name == "stub":
+        return StubBackend()
+    if name == "libretranslate":
+        return LibreTranslateBackend(
+            config.get("TRANSLATION_URL", "http://localhost:5000/translate"),
+            config.get("TRANSLATION_API_KEY") or None,
+        )
+    raise ValueError(f"Unknown translation backend: {name}")
+
+
+class TranslationService:
+    """Cached, batched translation of transcript segments."""
+
+    def __init__(self, backend: TranslationBackend, cache: Optional[TranslationCache] = None,
+                 batch_size: int = BATCH_SIZE, batch_window: float = BATCH_WINDOW):
+        self.backend = backend
+        self.cache = cache if cache is not None else TranslationCache()
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        # Segments waiting for a backend request, per (source, target) language pair
+        self._pending: Dict[Tuple[Optional[str], str], List[Tuple[str, str]]] = {}
+        self._timers: Dict[Tuple[Optional[str], str], asyncio.TimerHandle] = {}
+        self._inflight: Dict[Tuple[Optional[str], str, str], asyncio.Future] = {}
+        self._save_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Load the saved cache and start saving it periodically."""
+        await asyncio.get_running_loop().run_in_executor(None, self.cache.load)
+        if self.cache.path and self._save_task is None:
+            self._save_task = asyncio.create_task(self._save_periodically())
+
+    async def stop(self) -> None:
+        """Stop saving and write the cache one last time."""
+        if self._save_task:
+            self._save_task.cancel()
+            try:
+                await self._save_task
+            except asyncio.CancelledError:
+                pass
+            self._save_task = None
+        await self.cache.save()
+
+    async def _save_periodically(self):
+        while True:
+            await asyncio.sleep(CACHE_SAVE_INTERVAL)
+            await self.cache.save()
+
+    async def translate(self, text: str, target: str, source: Optional[str] = None) -> Tuple[str, bool]:
+        """Translate one segment. Returns (translation, served_from_cache)."""
+        started = time.perf_counter()
+        key = normalize_text(text)
+        if not key or source == target:
+            return text, True
+
+        cached = self.cache.get(source, target, key)
+        if cached is not None:
+            CACHE_HITS.inc()
+            TRANSLATION_LATENCY.observe(time.perf_counter() - started)
+            return cached, True
+
+        CACHE_MISSES.inc()
+        future = self._inflight.get((source, target, key))
+        if future is None:
+            # First request for this phrase: queue it; later identical ones share the result
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[(source, target, key)] = future
+            self._enqueue(source, target, key, text)
+        translation = await asyncio.shield(future)
+        TRANSLATION_LATENCY.observe(time.perf_counter() - started)
+        return translation, False
+
+    def _enqueue(self, source: Optional[str], target: str, key: str, text: str) -> None:
+        pair = (source, target)
+        pending = self._pending.setdefault(pair, [])
+        pending.append((key, text))
+        if len(pending) >= self.batch_size:
+            self._schedule_flush(pair)
+        elif pair not in self._timers:
+            self._timers[pair] = asyncio.get_running_loop().call_later(
+                self.batch_window, self._schedule_flush, pair
+            )
+
+    def _schedule_flush(self, pair: Tuple[Optional[str], str]) -> None:
+        timer = self._timers.pop(pair, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(pair, None)
+        if batch:
+            asyncio.create_task(self._flush(pair, batch))
+
+    async def _flush(self, pair: Tuple[Optional[str], str], batch: List[Tuple[str, str]]) -> None:
+        """Send one batch to the backend and resolve everyone waiting on it."""
+        source, target = pair
+        BACKEND_SEGMENTS.inc(len(batch))
+        started = time.perf_counter()
+        try:
+            results = await self.backend.translate_batch([text for _, text in batch], source, target)
+            if len(results) != len(batch):
+                # Fail the whole batch so no caller waits on a phrase that never resolves
+                raise ValueError(f"{self.backend.name} returned {len(results)} translations for {len(batch)} texts")
+            error = None
+        except Exception as e:
+            BACKEND_ERRORS.inc()
+            logger.error(f"Translation to {target} failed: {e}")
+            results, error = None, e
+        BACKEND_LATENCY.observe(time.perf_counter() - started)
+
+        for index, (key, _) in enumerate(batch):
+            future = self._inflight.pop((source, target, key), None)
+            if error is None:
+                self.cache.put(source, target, key, results[index])
+            if future is None or future.done():
+                continue
+            if error is None:
+                future.set_result(results[index])
+            else:
+                future.set_exception(error)
+
+
+class TranslationPlugin(Plugin):
+    """Plugin translating published transcripts into TRANSLATION_TARGETS."""
+    name = "translation"
+
+    async def start(self, context: PluginContext) -> None:
+        config = context.config
+        self.context = context
+        self.targets = [t.strip() for t in config.get("TRANSLATION_TARGETS", "en").split(",") if t.strip()]
+        cache = TranslationCache(
+            capacity=int(config.get("TRANSLATION_CACHE_SIZE", CACHE_SIZE)),
+            path=config.get("TRANSLATION_CACHE_PATH", "translation_cache.json") or None,
+        )
+        self.service = TranslationService(backend_from_config(config), cache)
+        await self.service.start()
+        context.transcript_listeners.append(self.on_transcript)
+
+    async def stop(self) -> None:
+        if self.on_transcript in self.context.transcript_listeners:
+            self.context.transcript_listeners.remove(self.on_transcript)
+        await self.service.stop()
+
+    async def on_transcript(self, segment: Dict[str, Any]) -> None:
+        """Translate a transcript segment into every target language and publish the results."""
+        await asyncio.gather(*(self._translate_segment(segment, target) for target in self.targets))
+
+    async def _translate_segment(self, segment: Dict[str, Any], target: str) -> None:
+        source = segment.get("language")
+        if source == target:
+            return
+        try:
+            text, cached = await self.service.translate(segment["text"], target, source)
+        except Exception:
+            return  # Already logged and counted per batch
+        await self.context.emit_event({
+            "type": "translation",
+            "data": {
+                "segment_id": segment.get("segment_id"),
+                "radio_id": segment.get("radio_id"),
+                "source_language": source,
+                "language": target,
+                "text": text,
+                "cached": cached,
+            },
+        }, topics=["transcript"])
@@ -0,0 +1,287 @@
+"""
+Transmit Scheduler for DMR Libertas
+
+This module queues outbound transmissions and feeds them to the radio from a
+single writer task. Jobs are ordered by priority (emergency first), per-user
+rate limits are enforced with token buckets, and writes are spaced on TDMA
+frame boundaries so the radio never sees interleaved commands.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, Optional
+from uuid import uuid4
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Limits from docs/PROTOCOL_NOTES.md
+SMS_PER_MINUTE = 10          # SMS rate limited to 10 messages per minute per user
+
+# Scheduler configuration
+MAX_QUEUE_SIZE = 256         # Pending jobs before new submissions are refused
+MAX_EMERGENCY_QUEUED = 16    # Pending emergency jobs; they skip the other limits, so cap them separately
+JOB_HISTORY = 1024           # Finished jobs kept for status lookups
+MAX_TRACKED_USERS = 4096     # Rate limit buckets kept before idle ones are pruned
+TDMA_FRAME = 0.060           # Two 30 ms timeslots per TDMA frame
+OUTAGE_HOLD = 30.0           # Seconds a job waits for the radio to reconnect before failing
+
+# Metrics
+TX_QUEUE_DEPTH = registry.gauge("dmr_tx_queue_depth", "Transmit jobs waiting for the radio")
+TX_SENT = registry.counter("dmr_tx_sent_total", "Transmit jobs written to the radio")
+TX_FAILED = registry.counter("dmr_tx_failed_total", "Transmit jobs that failed")
+TX_REJECTED = registry.counter("dmr_tx_rejected_total", "Transmit jobs refused by rate limits or queue limits")
+TX_WAIT = registry.histogram("dmr_tx_queue_wait_seconds", "Time transmit jobs spend queued")
+
+
+class Priority(IntEnum):
+    """Transmit priority; lower values go first."""
+    EMERGENCY = 0
+    HIGH = 1
+    NORMAL = 2
+    LOW = 3
+
+
+class JobStatus:
+    QUEUED = "queued"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class TxRejected(Exception):
+    """Raised when a transmit job is refused before being queued."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class TokenBucket:
+    """Token bucket rate limiter."""
+    capacity: float
+    refill_rate: float  # tokens per second
+    tokens: float = None
+    updated: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        if self.tokens is None:
+            self.tokens = self.capacity
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def consume(self, amount: float = 1.0) -> bool:
+        """Take tokens if available."""
+        self._refill(time.monotonic())
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def retry_after(self, amount: float = 1.0) -> float:
+        """Seconds until amount tokens will be available."""
+        self._refill(time.monotonic())
+        return max(0.0, (amount - self.tokens) / self.refill_rate)
+
+
+@dataclass
+class TxJob:
+    """A queued transmission."""
+    message: str
+    user: str
+    priority: Priority = Priority.NORMAL
+    job_id: str = field(default_factory=lambda: str(uuid4()))
+    status: str = JobStatus.QUEUED
+    created_at: float = field(default_factory=time.time)
+    completed_at: Optional[float] = None
+    error: Optional[str] = None
+    _done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "user": self.user,
+            "priority": self.priority.name.lower(),
+            "status": self.status,
+            "created_at": self.created_at,
+            "completed_at": self.completed_at,
+            "error": self.error,
+        }
+
+
+class TxScheduler:
+    """Serializes transmissions to the radio in priority order."""
+
+    def __init__(self, serial_handler, max_queue_size: int = MAX_QUEUE_SIZE,
+                 sms_per_minute: int = SMS_PER_MINUTE, frame_interval: float = TDMA_FRAME,
+                 max_emergency_queued: int = MAX_EMERGENCY_QUEUED):
+        self.serial_handler = serial_handler
+        self.max_queue_size = max_queue_size
+        self.max_emergency_queued = max_emergency_queued
+        self.sms_per_minute = sms_per_minute
+        self.frame_interval = frame_interval
+        self.on_status: Optional[Callable[[TxJob], Awaitable[None]]] = None
+
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._jobs: "OrderedDict[str, TxJob]" = OrderedDict()
+        self._writer_task: Optional[asyncio.Task] = None
+        self._last_write = 0.0
+        self._emergency_queued = 0
+
+        TX_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    async def start(self) -> None:
+        """Start the writer task."""
+        if self._writer_task is None:
+            self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def stop(self) -> None:
+        """Stop the writer task. Queued jobs stay queued."""
+        if self._writer_task:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+
+    def submit(self, message: str, user: str, priority: Priority = Priority.NORMAL) -> TxJob:
+        """Queue a transmission and return its job.
+
+        user identifies the sender for rate limiting and must come from the
+        connection (client address), never from the request itself. Raises
+        TxRejected if the user is over their rate limit or the queue is full.
+        Emergency traffic bypasses the per-user limit and the queue limit but
+        has its own, smaller cap; callers must authorize it first.
+        """
+        if priority == Priority.EMERGENCY:
+            if self._emergency_queued >= self.max_emergency_queued:
+                TX_REJECTED.inc()
+                raise TxRejected("Too many emergency transmissions queued", retry_after=1.0)
+        elif self._queue.qsize() >= self.max_queue_size:
+            TX_REJECTED.inc()
+            raise TxRejected("Transmit queue is full", retry_after=1.0)
+        else:
+            bucket = self._buckets.get(user)
+            if bucket is None:
+                if len(self._buckets) >= MAX_TRACKED_USERS:
+                    self._prune_buckets()
+                bucket = TokenBucket(capacity=self.sms_per_minute, refill_rate=self.sms_per_minute / 60.0)
+                self._buckets[user] = bucket
+            if not bucket.consume():
+                TX_REJECTED.inc()
+                raise TxRejected(f"Rate limit of {self.sms_per_minute} messages per minute exceeded",
+                                 retry_after=bucket.retry_after())
+
+        job = TxJob(message=message, user=user, priority=priority)
+        if priority == Priority.EMERGENCY:
+            self._emergency_queued += 1
+        self._remember(job)
+        self._queue.put_nowait((job.priority, next(self._seq), job))
+        return job
+
+    def get_job(self, job_id: str) -> Optional[TxJob]:
+        """Look up a job by ID."""
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[TxJob]:
+        """Wait for a job to finish."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        await asyncio.wait_for(job._done.wait(), timeout)
+        return job
+
+    def get_queue_size(self) -> int:
+        return self._queue.qsize()
+
+    def _prune_buckets(self) -> None:
+        """Forget users whose buckets have refilled completely."""
+        now = time.monotonic()
+        for user, bucket in list(self._buckets.items()):
+            bucket._refill(now)
+            if bucket.tokens >= bucket.capacity:
+                del self._buckets[user]
+
+    def _remember(self, job: TxJob) -> None:
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > JOB_HISTORY:
+            # Drop the oldest finished job; queued jobs are never forgotten
+            for job_id, old in self._jobs.items():
+                if old.status in (JobStatus.SENT, JobStatus.FAILED):
+                    del self._jobs[job_id]
+                    break
+            else:
+                break
+
+    async def _set_status(self, job: TxJob, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        if status in (JobStatus.SENT, JobStatus.FAILED):
+            job.completed_at = time.time()
+            job._done.set()
+        if self.on_status:
+            try:
+                await self.on_status(job)
+            except Exception as e:
+                logger.error(f"Error in transmit status callback: {e}")
+
+    async def _wait_for_slot(self) -> None:
+        """Wait for the next TDMA frame boundary after the previous write."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        next_slot = self._last_write + self.frame_interval
+        if now < next_slot:
+            await asyncio.sleep(next_slot - now)
+
+    async def _writer_loop(self):
+        """Single writer: the only place that transmits through the radio."""
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job = await self._queue.get()
+            if job.priority == Priority.EMERGENCY:
+                self._emergency_queued -= 1
+            try:
+                TX_WAIT.observe(time.time() - job.created_at)
+                await self._wait_for_slot()
+
+                # Hold the job across a short outage instead of failing it outright;
+                # a write that fails because the link dropped gets one retry
+                sent = False
+                for attempt in range(2):
+                    if not await self.serial_handler.wait_connected(OUTAGE_HOLD):
+                        break
+                    if attempt == 0:
+                        await self._set_status(job, JobStatus.SENDING)
+                    sent = await self.serial_handler.send_message(job.message)
+                    self._last_write = loop.time()
+                    if sent or self.serial_handler.connected:
+                        break
+
+                if sent:
+                    TX_SENT.inc()
+                    await self._set_status(job, JobStatus.SENT)
+                elif not self.serial_handler.connected:
+                    TX_FAILED.inc()
+                    await self._set_status(job, JobStatus.FAILED, "Radio not connected")
+                else:
+                    TX_FAILED.inc()
+                    await self._set_status(job, JobStatus.FAILED, "Radio write failed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error transmitting job {job.job_id}: {e}")
+                TX_FAILED.inc()
+                await self._set_status(job, JobStatus.FAILED, str(e))
+            finally:
+                self._queue.task_done()
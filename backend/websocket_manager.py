@@ -7,83 +7,239 @@ Handles connection management, message broadcasting, and client tracking.
 import asyncio
 import json
 import logging
+import time
 from typing import Dict, List, Optional, Any, Set
 from dataclasses import dataclass, field
 from uuid import uuid4
 
 from fastapi import WebSocket
 
+from metrics import registry
+
 logger = logging.getLogger(__name__)
 
+# Connection lifecycle defaults. Dead connections are found by the server's
+# protocol-level ping frames (uvicorn ws_ping_interval/ws_ping_timeout); the
+# JSON ping below is only sent to clients that ask for it.
+PING_INTERVAL = 20.0        # seconds of silence before an opted-in client gets a JSON ping
+PING_TIMEOUT = 20.0         # seconds an opted-in client has to answer before it is evicted
+SEND_TIMEOUT = 5.0          # seconds a single send may take before the client is evicted
+MAX_CONNECTIONS_PER_IP = 32
+
+# Metrics
+BROADCAST_SECONDS = registry.histogram("dmr_ws_broadcast_seconds", "Time to fan a message out to all clients")
+BROADCAST_TOTAL = registry.counter("dmr_ws_broadcasts_total", "Messages broadcast to clients")
+SEND_ERRORS = registry.counter("dmr_ws_send_errors_total", "Failed sends to WebSocket clients")
+EVICTIONS = registry.counter("dmr_ws_evictions_total", "Clients evicted for failed sends or missed pings")
+REJECTED = registry.counter("dmr_ws_rejected_total", "Connections refused by the per-IP cap")
+
 @dataclass
 class Client:
     """Represents a connected WebSocket client."""
     websocket: WebSocket
     client_id: str = field(default_factory=lambda: str(uuid4()))
     subscriptions: Set[str] = field(default_factory=set)
+    pending_sends: int = 0
+    remote_ip: str = ""
+    connected_at: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.monotonic)
+    heartbeat: bool = False  # Opted in to application-level JSON pings
+    closed: bool = False
     
-    async def send_json(self, data: Any) -> bool:
+    async def send_json(self, data: Any, timeout: Optional[float] = SEND_TIMEOUT) -> bool:
         """Send JSON data to this client."""
+        if self.closed:
+            return False
+        self.pending_sends += 1
         try:
             if isinstance(data, (dict, list)):
                 data = json.dumps(data)
-            await self.websocket.send_text(data)
+            await asyncio.wait_for(self.websocket.send_text(data), timeout)
             return True
         except Exception as e:
-            logger.error(f"Error sending to client {self.client_id}: {e}")
+            SEND_ERRORS.inc()
+            logger.error(f"Error sending to client {self.client_id}: {e!r}")
             return False
+        finally:
+            self.pending_sends -= 1
 
 class ConnectionManager:
-    """Manages WebSocket connections and message broadcasting."""
+    """Manages WebSocket connections and message broadcasting.
     
-    def __init__(self):
+    Clients are indexed by ID, by socket and by topic, so connecting,
+    disconnecting and publishing never scan unrelated clients. Clients that
+    fail a send are evicted, as are clients that opted in to JSON pings and
+    stopped answering them.
+    """
+    
+    def __init__(self, ping_interval: float = PING_INTERVAL, ping_timeout: float = PING_TIMEOUT,
+                 max_per_ip: int = MAX_CONNECTIONS_PER_IP):
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.max_per_ip = max_per_ip
         self.active_connections: Dict[str, Client] = {}
-        self._lock = asyncio.Lock()
+        self._by_socket: Dict[int, Client] = {}  # Starlette WebSockets aren't hashable, so key on id()
+        self._by_ip: Dict[str, int] = {}
+        self._topics: Dict[str, Set[str]] = {}
+        self._heartbeat_clients: Set[str] = set()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start the heartbeat task."""
+        if self._heartbeat_task is None and self.ping_interval > 0:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+    
+    async def stop(self) -> None:
+        """Stop the heartbeat task."""
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
     
-    async def connect(self, websocket: WebSocket) -> str:
-        """Register a new WebSocket connection."""
-        client = Client(websocket=websocket)
+    async def connect(self, websocket: WebSocket) -> Optional[str]:
+        """Accept and register a new WebSocket connection.
         
-        async with self._lock:
-            self.active_connections[client.client_id] = client
+        Returns None if the connection was refused by the per-IP cap.
+        """
+        remote_ip = websocket.client.host if websocket.client else ""
+        if self.max_per_ip and self._by_ip.get(remote_ip, 0) >= self.max_per_ip:
+            REJECTED.inc()
+            logger.warning(f"Refusing WebSocket connection from {remote_ip}: limit of {self.max_per_ip} reached")
+            await websocket.close(code=1008)
+            return None
+        
+        # Count the connection before awaiting so concurrent connects see it
+        self._by_ip[remote_ip] = self._by_ip.get(remote_ip, 0) + 1
+        try:
+            await websocket.accept()
+        except Exception:
+            self._release_ip(remote_ip)
+            raise
+        client = Client(websocket=websocket, remote_ip=remote_ip)
+        self.active_connections[client.client_id] = client
+        self._by_socket[id(websocket)] = client
         
         logger.info(f"New WebSocket connection: {client.client_id}")
         return client.client_id
     
     def disconnect(self, websocket: WebSocket) -> None:
         """Remove a WebSocket connection."""
-        client_id = None
-        
-        # Find the client ID for this WebSocket
-        for cid, client in self.active_connections.items():
-            if client.websocket == websocket:
-                client_id = cid
-                break
-        
-        if client_id:
-            self.active_connections.pop(client_id, None)
-            logger.info(f"WebSocket disconnected: {client_id}")
+        client = self._by_socket.get(id(websocket))
+        if client is not None and client.websocket is websocket:
+            self._remove(client)
+            logger.info(f"WebSocket disconnected: {client.client_id}")
+    
+    def _remove(self, client: Client) -> None:
+        """Drop a client from every index. Safe to call more than once."""
+        if self.active_connections.pop(client.client_id, None) is None:
+            return
+        client.closed = True
+        self._by_socket.pop(id(client.websocket), None)
+        self._release_ip(client.remote_ip)
+        self._heartbeat_clients.discard(client.client_id)
+        for topic in client.subscriptions:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client.client_id)
+                if not subscribers:
+                    del self._topics[topic]
+    
+    def _release_ip(self, remote_ip: str) -> None:
+        count = self._by_ip.get(remote_ip, 0) - 1
+        if count > 0:
+            self._by_ip[remote_ip] = count
+        else:
+            self._by_ip.pop(remote_ip, None)
+    
+    async def _evict(self, client: Client, reason: str) -> None:
+        """Remove a client and close its socket."""
+        if client.closed:
+            return
+        self._remove(client)
+        EVICTIONS.inc()
+        logger.warning(f"Evicting WebSocket client {client.client_id}: {reason}")
+        try:
+            await asyncio.wait_for(client.websocket.close(code=1011), SEND_TIMEOUT)
+        except Exception:
+            pass  # The connection is already gone
+    
+    def set_heartbeat(self, client_id: str, enabled: bool) -> bool:
+        """Opt a client in to or out of JSON pings."""
+        client = self.active_connections.get(client_id)
+        if client is None:
+            return False
+        client.heartbeat = enabled
+        client.last_seen = time.monotonic()
+        if enabled:
+            self._heartbeat_clients.add(client_id)
+        else:
+            self._heartbeat_clients.discard(client_id)
+        return True
+    
+    def mark_alive(self, client_id: str) -> None:
+        """Record that a client sent something; any message counts as a pong."""
+        client = self.active_connections.get(client_id)
+        if client is not None:
+            client.last_seen = time.monotonic()
+    
+    async def _send(self, client: Client, data: str) -> bool:
+        """Send to a client, evicting it if the send fails."""
+        if await client.send_json(data):
+            return True
+        await self._evict(client, "send failed")
+        return False
+    
+    async def _fan_out(self, clients: List[Client], data: str) -> None:
+        if clients:
+            await asyncio.gather(*(self._send(client, data) for client in clients))
+    
+    async def _heartbeat(self):
+        """Ping quiet opted-in clients and evict those that stay silent past the timeout."""
+        while True:
+            await asyncio.sleep(self.ping_interval / 2)
+            now = time.monotonic()
+            ping = json.dumps({"type": "ping", "timestamp": time.time()})
+            dead, quiet = [], []
+            for client_id in self._heartbeat_clients:
+                client = self.active_connections[client_id]
+                silent = now - client.last_seen
+                if silent > self.ping_interval + self.ping_timeout:
+                    dead.append(client)
+                elif silent > self.ping_interval:
+                    quiet.append(client)
+            if dead:
+                await asyncio.gather(*(self._evict(client, "ping timeout") for client in dead))
+            await self._fan_out(quiet, ping)
     
     async def send_personal_message(self, client_id: str, message: Any) -> bool:
         """Send a message to a specific client."""
-        if client_id not in self.active_connections:
+        client = self.active_connections.get(client_id)
+        if client is None:
             return False
-            
-        client = self.active_connections[client_id]
-        return await client.send_json(message)
+        if isinstance(message, (dict, list)):
+            message = json.dumps(message)
+        return await self._send(client, message)
     
     async def broadcast(self, message: Any, exclude: Optional[List[str]] = None) -> None:
         """Send a message to all connected clients."""
-        exclude = exclude or []
-        tasks = []
+        started = time.perf_counter()
+        if isinstance(message, (dict, list)):
+            message = json.dumps(message)  # Serialize once, not per client
         
-        for client_id, client in list(self.active_connections.items()):
-            if client_id not in exclude:
-                tasks.append(client.send_json(message))
+        if exclude:
+            excluded = set(exclude)
+            clients = [c for cid, c in self.active_connections.items() if cid not in excluded]
+        else:
+            clients = list(self.active_connections.values())
         
         # Run sends in parallel
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        await self._fan_out(clients, message)
+        
+        BROADCAST_TOTAL.inc()
+        BROADCAST_SECONDS.observe(time.perf_counter() - started)
     
     async def broadcast_json(self, data: Any, exclude: Optional[List[str]] = None) -> None:
         """Broadcast a JSON-serializable object to all clients."""
@@ -96,6 +252,7 @@ class ConnectionManager:
             
         client = self.active_connections[client_id]
         client.subscriptions.add(topic)
+        self._topics.setdefault(topic, set()).add(client_id)
         logger.debug(f"Client {client_id} subscribed to {topic}")
         return True
     
@@ -106,36 +263,47 @@ class ConnectionManager:
             
         client = self.active_connections[client_id]
         client.subscriptions.discard(topic)
+        subscribers = self._topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(client_id)
+            if not subscribers:
+                del self._topics[topic]
         logger.debug(f"Client {client_id} unsubscribed from {topic}")
         return True
     
     async def publish(self, topic: str, message: Any) -> None:
         """Publish a message to all clients subscribed to a topic."""
-        tasks = []
+        subscribers = self._topics.get(topic)
+        if not subscribers:
+            return
         
-        for client in self.active_connections.values():
-            if topic in client.subscriptions:
-                tasks.append(client.send_json({
-                    "type": "pubsub",
-                    "topic": topic,
-                    "data": message
-                }))
+        data = json.dumps({
+            "type": "pubsub",
+            "topic": topic,
+            "data": message
+        })
+        clients = [self.active_connections[cid] for cid in subscribers if cid in self.active_connections]
         
         # Run sends in parallel
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        await self._fan_out(clients, data)
     
     def get_client_count(self) -> int:
         """Get the number of connected clients."""
         return len(self.active_connections)
     
+    def get_queue_depth(self) -> Dict[str, int]:
+        """Get the total and worst-case number of in-flight sends across clients."""
+        depths = [client.pending_sends for client in self.active_connections.values()]
+        return {"total": sum(depths), "max": max(depths, default=0)}
+    
     def get_connected_clients(self) -> List[Dict[str, Any]]:
         """Get information about all connected clients."""
         return [
             {
                 "client_id": client.client_id,
+                "remote_ip": client.remote_ip,
                 "subscriptions": list(client.subscriptions),
-                "connected_at": getattr(client.websocket, "connected_at", None)
+                "connected_at": client.connected_at
             }
             for client in self.active_connections.values()
         ]